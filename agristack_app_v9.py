@@ -11,7 +11,21 @@ from pathlib import Path
 import fitz
 import math
 import pydeck as pdk
+import json
+import sqlite3
+import pyarrow as pa
+import pyarrow.compute as pc
+import threading
+import itertools
+import heapq
+import bisect
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import io
+import zipfile
+import shutil
 from datetime import datetime, timedelta
+from PIL import Image, ImageOps
 
 # ------------------------------
 # MODULE 0: CONFIGURATION
@@ -167,11 +181,15 @@ html, body, [class*="css"]  {font-family: "Space Grotesk", sans-serif;}
 
 PROVISIONAL_LABEL = "Provisional – For Scheme Delivery Only – Not a Title Document"
 
-def generate_strong_fid(name, village_code, device_id="TAB-09", parentage=""):
+def fid_identity_digest(name, device_id="TAB-09", parentage=""):
+    """Full SHA-256 of the (name, parentage, device) input behind an F-ID."""
+    raw_string = f"{str(name).strip().upper()}|{str(parentage).strip().upper()}|{device_id}"
+    return hashlib.sha256(raw_string.encode()).hexdigest()
+
+def generate_strong_fid(name, village_code, device_id="TAB-09", parentage="", width=6):
     """Offline-Resilient Farmer ID Generation (Section 2.1.1)"""
     lgd = str(village_code).strip().upper()
-    raw_string = f"{str(name).strip().upper()}|{str(parentage).strip().upper()}|{device_id}"
-    hash_part = hashlib.sha256(raw_string.encode()).hexdigest()[:6].upper()
+    hash_part = fid_identity_digest(name, device_id, parentage)[:width].upper()
     return f"JK-FID-{lgd}-{hash_part}"
 
 def generate_pid(khasra_no, village_code):
@@ -196,6 +214,75 @@ def haversine_meters(lat1, lon1, lat2, lon2):
     a = math.sin(dphi/2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda/2)**2
     return 2 * r * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
+GIS_OVERLAP_RADIUS_M = 15
+# Forward half of the 3x3 neighbourhood, so each pair of grid cells is compared once
+_GRID_NEIGHBOURS = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+def find_proximity_pairs(lats, lons, radius_m=GIS_OVERLAP_RADIUS_M):
+    """Uniform-grid spatial index: all point pairs within radius_m, as (i, j, distance_m) with i < j.
+
+    Points are projected to a local equirectangular plane and bucketed into radius-sized
+    cells; candidate pairs come from a join on neighbouring cell keys, so the cost is
+    near-linear for field-survey densities.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    valid = np.flatnonzero(~(np.isnan(lats) | np.isnan(lons)))
+    if len(valid) < 2 or radius_m <= 0:
+        return []
+    r = 6371000
+    y = np.radians(lats[valid]) * r
+    x = np.radians(lons[valid]) * r * math.cos(math.radians(float(lats[valid].mean())))
+    grid = pd.DataFrame({
+        'cx': np.floor(x / radius_m).astype(np.int64),
+        'cy': np.floor(y / radius_m).astype(np.int64),
+        'k': np.arange(len(valid))
+    })
+
+    pairs = []
+    for dx, dy in _GRID_NEIGHBOURS:
+        neighbours = grid.assign(cx=grid['cx'] - dx, cy=grid['cy'] - dy)
+        cand = grid.merge(neighbours, on=['cx', 'cy'], suffixes=('_a', '_b'))
+        a, b = cand['k_a'].to_numpy(), cand['k_b'].to_numpy()
+        if dx == 0 and dy == 0:
+            a, b = a[a < b], b[a < b]
+        dist = np.hypot(x[a] - x[b], y[a] - y[b])
+        hit = dist <= radius_m
+        i, j = valid[a[hit]], valid[b[hit]]
+        pairs.extend(zip(np.minimum(i, j).tolist(), np.maximum(i, j).tolist(), dist[hit].tolist()))
+    return pairs
+
+def detect_plot_overlaps(df_final, radius_m=GIS_OVERLAP_RADIUS_M):
+    """Flags different plots captured within radius_m of each other (ghost-survey pattern).
+
+    Only rows with a VDV GPS capture are compared; a row without one carries no location
+    evidence (the demo plot center ignores the village). Returns the annotated frame and a
+    pair table for the GIS Analyst Review Queue.
+    """
+    df_final = df_final.reset_index(drop=True)
+    lats = pd.to_numeric(df_final['VDV_Lat'], errors='coerce')
+    lons = pd.to_numeric(df_final['VDV_Lon'], errors='coerce')
+
+    plot_ids = df_final['Plot_ID'].tolist()
+    khasras = df_final['Khasra_No'].astype(str).tolist()
+    matches = [[] for _ in range(len(df_final))]
+    pair_rows = []
+    for i, j, dist in find_proximity_pairs(lats.to_numpy(), lons.to_numpy(), radius_m):
+        if plot_ids[i] == plot_ids[j]:
+            continue
+        matches[i].append(khasras[j])
+        matches[j].append(khasras[i])
+        pair_rows.append({
+            'Plot_ID_A': plot_ids[i], 'Khasra_A': khasras[i], 'AgriStack_FID_A': df_final.at[i, 'AgriStack_FID'],
+            'Plot_ID_B': plot_ids[j], 'Khasra_B': khasras[j], 'AgriStack_FID_B': df_final.at[j, 'AgriStack_FID'],
+            'Distance_m': round(dist, 1)
+        })
+    df_final['GIS_Proximity_Flag'] = [len(m) > 0 for m in matches]
+    df_final['GIS_Proximity_Matches'] = [",".join(sorted(set(m))) for m in matches]
+    pairs_df = pd.DataFrame(pair_rows, columns=['Plot_ID_A', 'Khasra_A', 'AgriStack_FID_A',
+                                                'Plot_ID_B', 'Khasra_B', 'AgriStack_FID_B', 'Distance_m'])
+    return df_final, pairs_df
+
 def simulate_gis_integrity_check(khasra_no):
     """Simulates Geofence check (Section 4.2)"""
     if "2501" in str(khasra_no):
@@ -204,6 +291,99 @@ def simulate_gis_integrity_check(khasra_no):
     jitter = random.uniform(-0.0003, 0.0003)
     return True, lat + jitter, lon - jitter, "WITHIN_GEOFENCE"
 
+MARLA_SQM = 25.29285264  # 1 Marla = 272.25 sq ft
+MARLAS_PER_KANAL = 20
+AREA_DEVIATION_TOLERANCE_PCT = 20.0
+AREA_DEVIATION_PENALTY = -0.15
+
+def sqm_to_kanal_marla(area_sqm):
+    """Converts square meters to whole (Kanal, Marla)."""
+    total_marla = int(round(area_sqm / MARLA_SQM))
+    return total_marla // MARLAS_PER_KANAL, total_marla % MARLAS_PER_KANAL
+
+def format_boundary(points):
+    """Serializes a boundary walk as 'lat,lon;lat,lon;...' for CSV export."""
+    return ";".join(f"{lat:.6f},{lon:.6f}" for lat, lon in points)
+
+def parse_boundary(text):
+    """Parses a 'lat,lon;lat,lon' boundary walk (newlines also separate points)."""
+    points = []
+    for chunk in re.split(r'[;\n]+', str(text)):
+        parts = chunk.split(",")
+        if len(parts) != 2:
+            continue
+        lat, lon = parse_float(parts[0].strip()), parse_float(parts[1].strip())
+        if lat is not None and lon is not None:
+            points.append((lat, lon))
+    return points
+
+def simulate_boundary_walk(khasra_no, n_vertices=6):
+    """Simulated GPS walk around a plot: an irregular polygon of 1.5-12 Kanal at the plot center."""
+    center_lat, center_lon = get_plot_center(khasra_no) if str(khasra_no).strip() else (33.7782, 76.5762)
+    target_sqm = random.uniform(1.5, 12.0) * MARLAS_PER_KANAL * MARLA_SQM
+    radius_m = math.sqrt(2 * target_sqm / (n_vertices * math.sin(2 * math.pi / n_vertices)))
+    m_per_deg_lat = 111320.0
+    m_per_deg_lon = m_per_deg_lat * math.cos(math.radians(center_lat))
+    points = []
+    for k in range(n_vertices):
+        theta = 2 * math.pi * k / n_vertices + random.uniform(-0.15, 0.15)
+        r = radius_m * random.uniform(0.85, 1.15)
+        points.append((center_lat + r * math.sin(theta) / m_per_deg_lat,
+                       center_lon + r * math.cos(theta) / m_per_deg_lon))
+    return points
+
+def polygon_areas_sqm(boundaries):
+    """Vectorized shoelace area (m²) for a Series of boundary strings; NaN where < 3 vertices.
+
+    Each polygon is projected onto a local equirectangular plane around its own centroid.
+    """
+    boundaries = pd.Series(boundaries)
+    areas = pd.Series(np.nan, index=boundaries.index, dtype=float)
+    chunks = boundaries.fillna("").astype(str).str.split(r'[;\n]+', regex=True).explode()
+    coords = chunks.str.split(",", expand=True)
+    if coords.shape[1] < 2:
+        return areas
+    if coords.shape[1] > 2:
+        # Same rule as parse_boundary: a vertex is exactly 'lat,lon'
+        coords = coords[coords.iloc[:, 2:].isna().all(axis=1)]
+    verts = pd.DataFrame({
+        'lat': pd.to_numeric(coords[0], errors='coerce'),
+        'lon': pd.to_numeric(coords[1], errors='coerce')
+    }).dropna()
+    verts['poly'] = verts.index
+    verts = verts.reset_index(drop=True)
+    if len(verts) == 0:
+        return areas
+    g = verts.groupby('poly', sort=False)
+    lat0 = g['lat'].transform('mean')
+    r = 6371000
+    y = np.radians(verts['lat'] - lat0) * r
+    x = np.radians(verts['lon'] - g['lon'].transform('mean')) * r * np.cos(np.radians(lat0))
+    xy = pd.DataFrame({'poly': verts['poly'], 'x': x, 'y': y})
+    gxy = xy.groupby('poly', sort=False)
+    x_next = gxy['x'].shift(-1).fillna(gxy['x'].transform('first'))
+    y_next = gxy['y'].shift(-1).fillna(gxy['y'].transform('first'))
+    cross = (xy['x'] * y_next - x_next * xy['y']).groupby(xy['poly'], sort=False).sum()
+    counts = gxy.size()
+    result = (cross.abs() / 2).where(counts >= 3)
+    areas.loc[result.index] = result.to_numpy()
+    return areas
+
+def compute_area_deviation(df):
+    """Batch measured-vs-declared area check for every plot with a recorded boundary walk."""
+    boundary = df['Boundary_GPS'] if 'Boundary_GPS' in df.columns else pd.Series("", index=df.index)
+    measured = polygon_areas_sqm(boundary.reset_index(drop=True))
+    measured.index = df.index
+    kanal = pd.to_numeric(df.get('Area_Kanal', pd.Series(np.nan, index=df.index)), errors='coerce')
+    marla = pd.to_numeric(df.get('Area_Marla', pd.Series(np.nan, index=df.index)), errors='coerce')
+    declared = (kanal * MARLAS_PER_KANAL + marla.fillna(0)) * MARLA_SQM
+    declared = declared.where(declared > 0)
+    return pd.DataFrame({
+        'Measured_Area_SqM': measured.round(1),
+        'Declared_Area_SqM': declared.round(1),
+        'Area_Deviation_Pct': ((measured - declared) / declared * 100).round(1)
+    }, index=df.index)
+
 def parse_float(value):
     try:
         if value is None or (isinstance(value, float) and np.isnan(value)):
@@ -234,13 +414,68 @@ def month_add(dt, months):
     day = min(dt.day, [31,29 if year%4==0 and (year%100!=0 or year%400==0) else 28,31,30,31,30,31,31,30,31,30,31][month-1])
     return dt.replace(year=year, month=month, day=day)
 
-def fuzzy_match_score(name1, name2):
-    """Identity resolution with fuzzy matching (Section 3.1.A)"""
-    if pd.isna(name1) or pd.isna(name2): return 0
-    n1 = str(name1).lower().replace("sardar","").replace("shri","").replace("mr.","").strip()
-    n2 = str(name2).lower().replace("sardar","").replace("shri","").replace("mr.","").strip()
+def _map_unique(series, func):
+    """Applies func once per distinct (stringified) value instead of once per row."""
+    values = series.astype(str)
+    lookup = {v: func(v) for v in values.unique()}
+    return values.map(lookup)
+
+IDENTITY_CACHE_SIZE = 200_000
+# Identity scores are exact from here up, so the What-If simulator can re-threshold them down to this
+# value; pairs the cheap bounds place below it are left unscored (NaN)
+IDENTITY_EXACT_FLOOR = 40
+_IDENTITY_HONORIFICS = ("sardar", "shri", "mr.")
+
+def _strip_honorifics(name):
+    n = str(name).lower()
+    for h in _IDENTITY_HONORIFICS:
+        n = n.replace(h, "")
+    return n.strip()
+
+@lru_cache(maxsize=IDENTITY_CACHE_SIZE)
+def _identity_ratio(n1, n2):
+    """Exact SequenceMatcher score (0-100) for two normalized names."""
+    if n1 == n2:
+        return 100.0
     return round(SequenceMatcher(None, n1, n2).ratio()*100,1)
 
+@lru_cache(maxsize=IDENTITY_CACHE_SIZE)
+def _identity_bounded(n1, n2, threshold):
+    """Exact score for pairs that can reach threshold; NaN for pairs known to score below it.
+
+    The length-ratio and character-multiset bounds settle clear mismatches cheaply, so only
+    pairs that could pass pay for the full Ratcliff-Obershelp ratio.
+    """
+    if n1 == n2:
+        return 100.0
+    matcher = SequenceMatcher(None, n1, n2)
+    if matcher.real_quick_ratio() * 100 < threshold or matcher.quick_ratio() * 100 < threshold:
+        return np.nan
+    return round(matcher.ratio()*100,1)
+
+def identity_match_scores(names1, names2, threshold=None):
+    """Batch identity similarity (0-100) for two aligned name columns.
+
+    Each column is normalized once, identical pairs are scored once, and scores are memoized
+    across calls. With threshold=None every score is exact; with a threshold, scores at or
+    above it are exact and pairs that cannot reach it are NaN (below threshold, not measured).
+    """
+    s1 = pd.Series(names1).reset_index(drop=True)
+    s2 = pd.Series(names2).reset_index(drop=True)
+    scores = np.zeros(len(s1), dtype=float)
+    present = (s1.notna() & s2.notna() & (s1.astype(str) != "") & (s2.astype(str) != "")).to_numpy()
+    if not present.any():
+        return scores
+    n1 = _map_unique(s1[present], _strip_honorifics)
+    n2 = _map_unique(s2[present], _strip_honorifics)
+    codes, pairs = pd.factorize(pd.MultiIndex.from_arrays([n1, n2]))
+    if threshold is None:
+        unique_scores = np.array([_identity_ratio(a, b) for a, b in pairs], dtype=float)
+    else:
+        unique_scores = np.array([_identity_bounded(a, b, float(threshold)) for a, b in pairs], dtype=float)
+    scores[present] = unique_scores[codes]
+    return scores
+
 def check_custodian_status(remarks):
     """Statutory exclusions (Table 3.1)"""
     keywords = ['custodian','evacuee','muhajireen','state land','auqaf']
@@ -272,18 +507,39 @@ def check_mutation_logic(mutation_status, remarks):
     elif mut in ['pending','no']: return "BROKEN_CHAIN",-0.20
     return "ACTIVE",0.0
 
-def execute_verification_protocol(df):
+DEFAULT_POLICY = {
+    'green_cutoff': 0.80,
+    'amber_cutoff': 0.50,
+    'gis_penalty': 0.50,
+    'identity_penalty': 0.50,
+    'geofence_m': 50,
+    'fuzzy_threshold': 50,
+    'amnesty_months': 24,
+    'area_tolerance_pct': AREA_DEVIATION_TOLERANCE_PCT
+}
+
+def fid_input_records(df):
+    """(name, village_code, device_id, parentage) per row, as F-IDs are generated from them."""
+    return [
+        (row.get('Owner_Name','Unknown'), row.get('LGD_Code', row.get('Village_Code', "VIL001")),
+         row.get('VDV_Device_ID', "TAB-09"), row.get('Parentage_Name',''))
+        for row in df.to_dict('records')
+    ]
+
+def execute_verification_protocol(df, policy=None, fid_index=None):
     """Master governance protocol: generates FID, computes trust score, assigns channels"""
-    df = df.copy()
-    df['AgriStack_FID'] = df.apply(
-        lambda row: generate_strong_fid(
-            row.get('Owner_Name','Unknown'),
-            row.get('LGD_Code', row.get('Village_Code', "VIL001")),
-            row.get('VDV_Device_ID', "TAB-09"),
-            row.get('Parentage_Name','')
-        ),
-        axis=1
-    )
+    policy = {**DEFAULT_POLICY, **(policy or {})}
+    # Raw CSV text (a frame that skipped load_data_validated) is typed here; typed frames pass through
+    df, _ = coerce_to_schema(df)
+    fid_inputs = fid_input_records(df)
+    if fid_index is not None:
+        # Registry-backed assignment: a different farmer landing on a taken F-ID gets a widened one
+        fids, collided = fid_index.assign(fid_inputs)
+        df['AgriStack_FID'] = fids
+        df['FID_Collision_Resolved'] = collided
+    else:
+        df['AgriStack_FID'] = [generate_strong_fid(*inputs) for inputs in fid_inputs]
+        df['FID_Collision_Resolved'] = False
     df['Plot_ID'] = df.apply(
         lambda row: generate_pid(row.get('Khasra_No','000'), row.get('LGD_Code', row.get('Village_Code', "VIL001"))),
         axis=1
@@ -298,9 +554,27 @@ def execute_verification_protocol(df):
         axis=1
     )
     df['Provisional_Label'] = PROVISIONAL_LABEL
+    area_check = compute_area_deviation(df)
+    for col in area_check.columns:
+        df[col] = area_check[col]
+    owner_names = df['Owner_Name'] if 'Owner_Name' in df.columns else pd.Series("", index=df.index)
+    verified_names = df['VDV_Verified_Name'] if 'VDV_Verified_Name' in df.columns else df.get('Owner_Name', pd.Series("Unknown", index=df.index))
+    identity_floor = min(policy['fuzzy_threshold'], IDENTITY_EXACT_FLOOR)
+    df['Identity_Score'] = identity_match_scores(owner_names, verified_names, threshold=identity_floor)
+
+    # Typed columns (coerced once at load by COLUMN_SCHEMA) are read as arrays, not re-parsed per row
+    now = datetime.now()
+    n = len(df)
+    def column(name, default):
+        return df[name] if name in df.columns else pd.Series([default] * n, index=df.index, dtype=object)
+    vdv_lats = column('VDV_Lat', np.nan).to_numpy(dtype=float)
+    vdv_lons = column('VDV_Lon', np.nan).to_numpy(dtype=float)
+    proxy_flags = column('Proxy_Verification', False).fillna(False).to_numpy(dtype=bool)
+    created_dates = [v.to_pydatetime() if pd.notna(v) else now for v in column('Record_Created', pd.NaT)]
 
     results, map_points = [], []
-    for _, row in df.iterrows():
+    for pos, (_, row) in enumerate(df.iterrows()):
+        out = {}
         base_score = 1.0
         logic_trace = []
         hard_block_trigger = False
@@ -308,21 +582,22 @@ def execute_verification_protocol(df):
 
         # GIS check (uses VDV GPS if available)
         khasra = str(row.get('Khasra_No','000'))
-        vdv_lat = parse_float(row.get('VDV_Lat', None))
-        vdv_lon = parse_float(row.get('VDV_Lon', None))
-        if vdv_lat is not None and vdv_lon is not None:
+        vdv_lat, vdv_lon = vdv_lats[pos], vdv_lons[pos]
+        if not (np.isnan(vdv_lat) or np.isnan(vdv_lon)):
             center_lat, center_lon = get_plot_center(khasra)
             distance_m = haversine_meters(vdv_lat, vdv_lon, center_lat, center_lon)
-            gis_pass = distance_m <= 50
+            gis_pass = distance_m <= policy['geofence_m']
             gis_msg = f"{'WITHIN' if gis_pass else 'OUT_OF_BOUNDS'}_GEOFENCE ({int(distance_m)}m deviation)"
-            lat, lon = vdv_lat, vdv_lon
+            lat, lon = float(vdv_lat), float(vdv_lon)
         else:
             gis_pass, lat, lon, gis_msg = simulate_gis_integrity_check(khasra)
-        row['GIS_Status'] = gis_msg
+            distance_m = np.nan
+        out['GIS_Status'] = gis_msg
+        out['GIS_Distance_M'] = round(distance_m, 1)
         map_points.append({'lat': lat, 'lon': lon, 'status': 'PASS' if gis_pass else 'FAIL'})
         if not gis_pass:
-            base_score -= 0.50
-            logic_trace.append("GIS Integrity Fail (-0.50)")
+            base_score -= policy['gis_penalty']
+            logic_trace.append(f"GIS Integrity Fail (-{policy['gis_penalty']:.2f})")
             hard_block_trigger = True
 
         # Custodian check
@@ -339,6 +614,12 @@ def execute_verification_protocol(df):
             logic_trace.append(f"State Asset Block: {land_cat}")
         base_score += land_penalty
 
+        # Measured (boundary walk) vs declared Jamabandi area
+        area_dev = row.get('Area_Deviation_Pct', np.nan)
+        if pd.notna(area_dev) and abs(area_dev) > policy['area_tolerance_pct']:
+            base_score += AREA_DEVIATION_PENALTY
+            logic_trace.append(f"Area Deviation {area_dev:+.0f}% ({AREA_DEVIATION_PENALTY:+.2f})")
+
         # VDV validation
         verified_name = row.get('VDV_Verified_Name', row.get('Owner_Name','Unknown'))
         if pd.isna(verified_name) or str(verified_name).strip() == "":
@@ -346,10 +627,12 @@ def execute_verification_protocol(df):
             logic_trace.append("VDV Validation Missing (-0.20)")
 
         # Identity resolution
-        id_score = fuzzy_match_score(row.get('Owner_Name',''), verified_name)
-        if id_score < 50:
-            base_score -= 0.50
-            logic_trace.append(f"Identity Mismatch {id_score}% (-0.50)")
+        id_score = row['Identity_Score']
+        if pd.isna(id_score) or id_score < policy['fuzzy_threshold']:
+            base_score -= policy['identity_penalty']
+            # NaN: settled by the cheap bounds as below the floor, so no exact score was computed
+            shown = f"<{identity_floor:g}" if pd.isna(id_score) else id_score
+            logic_trace.append(f"Identity Mismatch {shown}% (-{policy['identity_penalty']:.2f})")
             hard_block_trigger = True
 
         # VDV rotation safeguard
@@ -362,7 +645,7 @@ def execute_verification_protocol(df):
             reasons.append("VDV_ROTATION_FAIL")
 
         # Proxy verification
-        proxy_flag = str(row.get('Proxy_Verification','')).strip().lower() in ['yes','true','1']
+        proxy_flag = proxy_flags[pos]
 
         # Grey channel logic for Varasat
         mutation_status = derive_mutation_status(row.get('Remarks_Kaifiyat',''))
@@ -379,9 +662,9 @@ def execute_verification_protocol(df):
             channel = "GREY"; action = "Deemed Verified (Varasat Amnesty)"
         elif is_custodian:
             channel = "AMBER"; action = "CRC Path (Custodian)"
-        elif final_score >= 0.80:
+        elif final_score >= policy['green_cutoff']:
             channel = "GREEN"; action = "Auto-Approve"
-        elif final_score >= 0.50:
+        elif final_score >= policy['amber_cutoff']:
             channel = "AMBER"; action = "Provisional Review"
         else:
             channel = "RED"; action = "Score Too Low"
@@ -391,19 +674,12 @@ def execute_verification_protocol(df):
             reasons.append("PROXY_VERIFICATION")
 
         # Amnesty and re-verification
-        created_ts = row.get('Record_Created','')
-        if created_ts:
-            try:
-                created_dt = datetime.strptime(created_ts, "%Y-%m-%d")
-            except Exception:
-                created_dt = datetime.now()
-        else:
-            created_dt = datetime.now()
+        created_dt = created_dates[pos]
         amnesty_expiry = ""
         reverify_by = ""
         if channel == "GREY":
-            amnesty_expiry = month_add(created_dt, 24).strftime("%Y-%m-%d")
-            if datetime.now() > month_add(created_dt, 24):
+            amnesty_expiry = month_add(created_dt, policy['amnesty_months']).strftime("%Y-%m-%d")
+            if now > month_add(created_dt, policy['amnesty_months']):
                 channel = "AMBER"
                 action = "Grey Amnesty Expired"
                 reasons.append("AMNESTY_EXPIRED")
@@ -411,55 +687,287 @@ def execute_verification_protocol(df):
             reverify_by = month_add(created_dt, 12).strftime("%Y-%m-%d")
 
         # Scheme flags and CRC
-        row['CRC_Issued'] = True if is_custodian else False
-        row['Credit_Path'] = "CRC_RESTRICTED" if is_custodian else "FULL"
-        row['KCC_Eligible'] = True if channel in ["GREEN","GREY"] and not is_custodian else False
-        row['PM_KISAN_Eligible'] = True if channel in ["GREEN","GREY","AMBER"] else False
-        row['PMFBY_Eligible'] = True if channel in ["GREEN","GREY","AMBER"] else False
+        out['CRC_Issued'] = True if is_custodian else False
+        out['Credit_Path'] = "CRC_RESTRICTED" if is_custodian else "FULL"
+        out['KCC_Eligible'] = True if channel in ["GREEN","GREY"] and not is_custodian else False
+        out['PM_KISAN_Eligible'] = True if channel in ["GREEN","GREY","AMBER"] else False
+        out['PMFBY_Eligible'] = True if channel in ["GREEN","GREY","AMBER"] else False
 
         # Workflow queues
         if channel == "AMBER":
-            row['Workflow_Queue'] = "BLOCK_TECH_UNIT"
+            out['Workflow_Queue'] = "BLOCK_TECH_UNIT"
         elif channel == "GREY":
-            row['Workflow_Queue'] = "MUTATION_FOLLOWUP"
+            out['Workflow_Queue'] = "MUTATION_FOLLOWUP"
         elif channel == "RED":
-            row['Workflow_Queue'] = "AUDIT_QUEUE"
+            out['Workflow_Queue'] = "AUDIT_QUEUE"
         else:
-            row['Workflow_Queue'] = "AUTO_CLEARED"
+            out['Workflow_Queue'] = "AUTO_CLEARED"
 
         # Audit log and transitions
-        prev_channel = row.get('Prev_Channel','NEW')
-        vdv_id = row.get('VDV_Device_ID','VDV-UNK')
-        row['Audit_Log'] = add_audit_entry(row.get('Audit_Log',''), prev_channel, channel, action, vdv_id)
+        prev_channel = row.get('Prev_Channel') or 'NEW'
+        vdv_id = row.get('VDV_Device_ID') or 'VDV-UNK'
+        out['Audit_Log'] = add_audit_entry(row.get('Audit_Log',''), prev_channel, channel, action, vdv_id)
 
-        # Safeguards
-        seed = int(hashlib.sha256(str(row['AgriStack_FID']).encode()).hexdigest()[:8], 16)
-        row['Super_Check_Selected'] = True if (seed % 100) < 5 else False
-        row['VDV_Rotation_Flag'] = True if vdv_rotation_fail else False
+        # Safeguards (Super-Check selection is stratified over the whole batch below)
+        out['VDV_Rotation_Flag'] = True if vdv_rotation_fail else False
 
         # Offline sync
-        row['Sync_Status'] = row.get('Sync_Status','QUEUED_OFFLINE')
-        row['Amnesty_Expiry'] = amnesty_expiry
-        row['Reverify_By'] = reverify_by
-
-        row['Trust_Score'] = final_score
-        row['Governance_Channel'] = channel
-        row['Action_Taken'] = action
-        row['Audit_Trace'] = "; ".join(logic_trace)
-        row['Validation_Status'] = channel
-        row['Confidence_Score'] = final_score
+        out['Sync_Status'] = row.get('Sync_Status') or 'QUEUED_OFFLINE'
+        out['Amnesty_Expiry'] = amnesty_expiry
+        out['Reverify_By'] = reverify_by
+
+        out['Trust_Score'] = final_score
+        out['Governance_Channel'] = channel
+        out['Action_Taken'] = action
+        out['Audit_Trace'] = "; ".join(logic_trace)
+        out['Validation_Status'] = channel
+        out['Confidence_Score'] = final_score
         eligible = []
-        if row['KCC_Eligible']:
+        if out['KCC_Eligible']:
             eligible.append("KCC")
-        if row['PM_KISAN_Eligible']:
+        if out['PM_KISAN_Eligible']:
             eligible.append("PM-KISAN")
-        if row['PMFBY_Eligible']:
+        if out['PMFBY_Eligible']:
             eligible.append("PMFBY")
-        row['Welfare_Eligibility_Flag'] = ",".join(eligible)
+        out['Welfare_Eligibility_Flag'] = ",".join(eligible)
+
+        results.append(out)
+
+    scored = pd.DataFrame(results, index=df.index)
+    for col in scored.columns:
+        df[col] = scored[col]
+    sampler = SuperCheckSampler()
+    sampler.offer(df)
+    df['Super_Check_Selected'] = sampler.mask(len(df))
+    return df, pd.DataFrame(map_points)
 
-        results.append(row)
+# ------------------------------
+# SUPER-CHECK SAMPLING
+# ------------------------------
+
+SUPER_CHECK_SEED = 20240601
+SUPER_CHECK_STRATA = ['Governance_Channel', 'VDV_Device_ID', 'Village_Code']
+SUPER_CHECK_PER_STRATUM = 2
+SUPER_CHECK_CHANNEL_WEIGHT = {'GREEN': 1, 'GREY': 1, 'AMBER': 2, 'RED': 3}
+SUPER_CHECK_PROXY_WEIGHT = 3.0
+
+class SuperCheckSampler:
+    """Deterministic stratified reservoir sample for Super-Check field audits.
+
+    Strata are Governance_Channel x VDV_Device_ID x Village_Code, each with a fixed-size
+    reservoir (larger for AMBER and RED). Every row gets a seeded hash key of its F-ID and
+    Plot ID, scaled so proxy verifications rank ahead (weighted reservoir sampling), and a
+    stratum keeps its smallest keys. Chunks can be offered in any order and the same seed
+    always yields the same sample.
+    """
+
+    def __init__(self, seed=SUPER_CHECK_SEED, per_stratum=SUPER_CHECK_PER_STRATUM):
+        self.seed = seed
+        self.per_stratum = per_stratum
+        self.rows_seen = 0
+        self._reservoirs = {}
+        self._population = {}
+
+    def _capacity(self, stratum):
+        return self.per_stratum * SUPER_CHECK_CHANNEL_WEIGHT.get(stratum[0], 1)
+
+    def _keys(self, chunk):
+        fids = chunk['AgriStack_FID'].astype(str).to_numpy()
+        plots = chunk['Plot_ID'].astype(str).to_numpy() if 'Plot_ID' in chunk.columns else np.full(len(chunk), "")
+        prefix = f"{self.seed}|".encode()
+        u = np.array([(int(hashlib.sha256(prefix + f"{f}|{p}".encode()).hexdigest()[:13], 16) + 0.5) / 16 ** 13
+                      for f, p in zip(fids, plots)])
+        proxy = chunk['Proxy_Verification'].fillna(False).astype(bool).to_numpy() if 'Proxy_Verification' in chunk.columns else np.zeros(len(chunk), dtype=bool)
+        # Exponential clocks: a weight-w row behaves like the first of w independent draws
+        return -np.log(u) / np.where(proxy, SUPER_CHECK_PROXY_WEIGHT, 1.0), proxy
+
+    def offer(self, chunk, offset=None):
+        """Streams one scored chunk whose rows sit at positions offset.. of the combined batch."""
+        offset = self.rows_seen if offset is None else offset
+        self.rows_seen = max(self.rows_seen, offset + len(chunk))
+        if len(chunk) == 0:
+            return
+        keys, proxy = self._keys(chunk)
+        strata = pd.DataFrame({col: (chunk[col].map(_clean_token).replace("", "NA").to_numpy() if col in chunk.columns else "NA")
+                               for col in SUPER_CHECK_STRATA}, index=range(len(chunk)))
+        candidates = strata.assign(_key=keys, _row=np.arange(offset, offset + len(chunk)), _proxy=proxy)
+        for stratum, size in candidates.groupby(SUPER_CHECK_STRATA, sort=False).size().items():
+            self._population[stratum] = self._population.get(stratum, 0) + int(size)
+        # Only a stratum's smallest keys in this chunk can enter its reservoir
+        candidates = candidates.sort_values(['_key', '_row'], kind="stable")
+        capacity = candidates['Governance_Channel'].map(SUPER_CHECK_CHANNEL_WEIGHT).fillna(1) * self.per_stratum
+        candidates = candidates[candidates.groupby(SUPER_CHECK_STRATA, sort=False).cumcount() < capacity]
+        for *stratum, key, row, is_proxy in candidates.itertuples(index=False, name=None):
+            stratum = tuple(stratum)
+            heap = self._reservoirs.setdefault(stratum, [])
+            item = (-key, -row, bool(is_proxy))
+            if len(heap) < self._capacity(stratum):
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    def selected(self):
+        """Sorted batch positions of the sampled rows."""
+        return np.sort(np.array([-row for heap in self._reservoirs.values() for _, row, _ in heap], dtype=np.int64))
+
+    def mask(self, n=None):
+        flags = np.zeros(self.rows_seen if n is None else n, dtype=bool)
+        flags[self.selected()] = True
+        return flags
+
+    def summary(self):
+        """Population, reservoir size and sample per stratum."""
+        rows = [(*stratum, population, self._capacity(stratum), len(self._reservoirs.get(stratum, [])),
+                 sum(1 for *_, is_proxy in self._reservoirs.get(stratum, []) if is_proxy))
+                for stratum, population in self._population.items()]
+        summary = pd.DataFrame(rows, columns=SUPER_CHECK_STRATA + ['Population', 'Reservoir', 'Sampled', 'Proxy_Sampled'])
+        return summary.sort_values(SUPER_CHECK_STRATA).reset_index(drop=True)
 
-    return pd.DataFrame(results), pd.DataFrame(map_points)
+# ------------------------------
+# POLICY WHAT-IF SIMULATION
+# ------------------------------
+
+CHANNELS = ["GREEN", "GREY", "AMBER", "RED"]
+_GREEN, _GREY, _AMBER, _RED = range(len(CHANNELS))
+MAX_POLICY_SCENARIOS = 500
+
+POLICY_LABELS = {
+    'green_cutoff': "Green score cut-off",
+    'amber_cutoff': "Amber score cut-off",
+    'gis_penalty': "GIS failure penalty",
+    'identity_penalty': "Identity mismatch penalty",
+    'geofence_m': "Geofence radius (m)",
+    'fuzzy_threshold': "Fuzzy match threshold (%)",
+    'amnesty_months': "Varasat amnesty (months)",
+    'area_tolerance_pct': "Area deviation tolerance (%)"
+}
+
+POLICY_SWEEP_DEFAULTS = {
+    'green_cutoff': [0.70, 0.75, 0.80, 0.85],
+    'amber_cutoff': [0.40, 0.45, 0.50, 0.55],
+    'gis_penalty': [0.25, 0.50],
+    'identity_penalty': [0.25, 0.50],
+    'geofence_m': [30, 50, 75, 100],
+    'fuzzy_threshold': [40, 50, 60, 70],
+    'amnesty_months': [12, 24, 36],
+    'area_tolerance_pct': [10, 20, 30]
+}
+
+def _months_until_expiry(created, now):
+    """Smallest m with month_add(created, m) >= now; Varasat amnesty has expired iff amnesty_months < m."""
+    m = max((now.year - created.year) * 12 + (now.month - created.month) - 1, 0)
+    while month_add(created, m) < now:
+        m += 1
+    return m
+
+def extract_policy_features(df_final):
+    """Extracts the policy-independent per-row feature matrix from a scored frame (done once per run)."""
+    now = datetime.now()
+    custodian = _map_unique(df_final['Remarks_Kaifiyat'], check_custodian_status)
+    land = _map_unique(df_final['Land_Type'], check_land_nuance_strict)
+    mutation = _map_unique(df_final['Remarks_Kaifiyat'],
+                           lambda rem: check_mutation_logic(derive_mutation_status(rem), rem))
+    verified = df_final['VDV_Verified_Name']
+    vdv_missing = verified.isna() | (verified.astype(str).str.strip() == "")
+    proxy = df_final['Proxy_Verification'].fillna(False).astype(bool)
+    expiry = df_final['Record_Created'].map(
+        lambda v: _months_until_expiry(v.to_pydatetime(), now) if pd.notna(v) else 0)
+
+    distance = pd.to_numeric(df_final['GIS_Distance_M'], errors='coerce').to_numpy(dtype=float)
+    simulated_pass = df_final['GIS_Status'].astype(str).str.startswith('WITHIN').to_numpy()
+    distance = np.where(np.isnan(distance), np.where(simulated_pass, 0.0, np.inf), distance)
+    area_dev = pd.to_numeric(df_final['Area_Deviation_Pct'], errors='coerce').abs().fillna(-1.0)
+
+    return {
+        'gis_distance': distance,
+        'id_score': pd.to_numeric(df_final['Identity_Score'], errors='coerce').fillna(0.0).to_numpy(dtype=float),
+        'area_dev_abs': area_dev.to_numpy(dtype=float),
+        'custodian': custodian.map(lambda r: r[0]).to_numpy(dtype=bool),
+        'custodian_penalty': custodian.map(lambda r: r[1]).to_numpy(dtype=float),
+        'land_penalty': land.map(lambda r: r[1]).to_numpy(dtype=float),
+        'land_hard_block': land.map(lambda r: r[2]).to_numpy(dtype=bool),
+        'vdv_missing': vdv_missing.to_numpy(dtype=bool),
+        'mutation_penalty': mutation.map(lambda r: r[1]).to_numpy(dtype=float),
+        'grey_candidate': (mutation.map(lambda r: r[0]) == "GREY_CANDIDATE").to_numpy(dtype=bool),
+        'rotation_fail': df_final['VDV_Rotation_Flag'].astype(bool).to_numpy(),
+        'proxy': proxy.to_numpy(dtype=bool),
+        'expiry_months': expiry.to_numpy(dtype=np.int64),
+        'channel': df_final['Governance_Channel'].map({c: i for i, c in enumerate(CHANNELS)}).fillna(_RED).to_numpy(dtype=np.int64)
+    }
+
+def build_policy_scenarios(sweep_values):
+    """Cartesian product of swept parameter values, each scenario completed from DEFAULT_POLICY."""
+    keys = list(sweep_values)
+    combos = itertools.product(*(sweep_values[k] for k in keys))
+    return [{**DEFAULT_POLICY, **dict(zip(keys, combo))} for combo in itertools.islice(combos, MAX_POLICY_SCENARIOS)]
+
+def simulate_policies(features, scenarios, block_cells=4_000_000):
+    """Evaluates many policy sets over one feature matrix, mirroring execute_verification_protocol.
+
+    Scenarios are broadcast against the rows in blocks of at most block_cells (scenario x row)
+    cells. Returns a summary frame (channel and eligibility counts per scenario) and one
+    baseline -> scenario channel-transition matrix per scenario.
+    """
+    base = features['channel']
+    n = len(base)
+    block = max(1, block_cells // max(n, 1))
+    summary, transitions = [], []
+    for start in range(0, len(scenarios), block):
+        chunk = [{**DEFAULT_POLICY, **sc} for sc in scenarios[start:start + block]]
+        k = len(chunk)
+
+        def param(name):
+            return np.array([sc[name] for sc in chunk], dtype=float)[:, None]
+
+        gis_fail = features['gis_distance'][None, :] > param('geofence_m')
+        id_fail = features['id_score'][None, :] < param('fuzzy_threshold')
+        area_fail = features['area_dev_abs'][None, :] > param('area_tolerance_pct')
+
+        # Same accumulation order as the per-row engine
+        score = 1.0 - gis_fail * param('gis_penalty')
+        score = score + features['custodian_penalty'] + features['land_penalty']
+        score = score + np.where(area_fail, AREA_DEVIATION_PENALTY, 0.0)
+        score = score - np.where(features['vdv_missing'], 0.20, 0.0)
+        score = score - id_fail * param('identity_penalty')
+        score = score + features['mutation_penalty']
+        score = np.maximum(np.round(score, 2), 0.0)
+
+        hard = gis_fail | id_fail | (features['land_hard_block'] | features['rotation_fail'])[None, :]
+        shape = (k, n)
+        channel = np.select(
+            [hard,
+             np.broadcast_to(features['grey_candidate'], shape),
+             np.broadcast_to(features['custodian'], shape),
+             score >= param('green_cutoff'),
+             score >= param('amber_cutoff')],
+            [_RED, _GREY, _AMBER, _GREEN, _AMBER],
+            default=_RED
+        )
+        channel = np.where(features['proxy'][None, :] & ((channel == _GREEN) | (channel == _GREY)), _AMBER, channel)
+        expired = param('amnesty_months') < features['expiry_months'][None, :]
+        channel = np.where((channel == _GREY) & expired, _AMBER, channel)
+
+        offsets = np.arange(k)[:, None]
+        counts = np.bincount((channel + offsets * 4).ravel(), minlength=4 * k).reshape(k, 4)
+        moves = np.bincount((base[None, :] * 4 + channel + offsets * 16).ravel(), minlength=16 * k).reshape(k, 4, 4)
+        kcc = (((channel == _GREEN) | (channel == _GREY)) & ~features['custodian'][None, :]).sum(axis=1)
+        welfare = (channel != _RED).sum(axis=1)
+        changed = (channel != base[None, :]).sum(axis=1)
+
+        for i, sc in enumerate(chunk):
+            label = f"S{start + i + 1:03d}"
+            summary.append({
+                'Scenario': label,
+                **{POLICY_LABELS[key]: sc[key] for key in POLICY_LABELS},
+                **{ch: int(counts[i, c]) for c, ch in enumerate(CHANNELS)},
+                'KCC_Eligible': int(kcc[i]),
+                'PM_KISAN_Eligible': int(welfare[i]),
+                'PMFBY_Eligible': int(welfare[i]),
+                'Channel_Changed': int(changed[i])
+            })
+            transitions.append(pd.DataFrame(moves[i], index=[f"From {c}" for c in CHANNELS],
+                                            columns=[f"To {c}" for c in CHANNELS]))
+    return pd.DataFrame(summary), transitions
 
 # ============================================================
 # MODULE 2: ROBUST DATA LOADING & OCR SIMULATION
@@ -475,33 +983,114 @@ USER_COLUMNS = [
     'Season', 'Crop_Sown', 'Record_Created', 'Prev_Channel', 'Audit_Log',
     'Sync_Status', 'Aadhaar_Verified', 'Aadhaar_Masked',
     'Revenue_Demand_Mutation', 'Role',
-    'Farmer_Photo_Name', 'Farmer_Photo_Size_KB',
-    'Plot_Photo_Name', 'Plot_Photo_Size_KB'
+    'Farmer_Photo_Name', 'Farmer_Photo_Size_KB', 'Farmer_Photo_SHA256',
+    'Plot_Photo_Name', 'Plot_Photo_Size_KB', 'Plot_Photo_SHA256', 'Boundary_GPS'
 ]
 
-def load_data_robust(uploaded_file):
-    """Robust CSV loader handling extra header rows"""
+# Declarative ingest schema: every USER_COLUMN not listed is free text. Each column is coerced
+# once, vectorized, at load; null tokens become NaN/NaT/<NA>, and unparseable or out-of-range
+# values are nulled and listed in the rejection report.
+NULL_TOKENS = ("", "NA", "N/A", "NAN", "NONE", "NULL", "-")
+BOOL_TOKENS = {"YES": True, "Y": True, "TRUE": True, "1": True, "NO": False, "N": False, "FALSE": False, "0": False}
+COLUMN_SCHEMA = {
+    'VDV_Lat': {'type': 'float', 'min': -90.0, 'max': 90.0},
+    'VDV_Lon': {'type': 'float', 'min': -180.0, 'max': 180.0},
+    'Area_Kanal': {'type': 'float', 'min': 0.0},
+    'Area_Marla': {'type': 'float', 'min': 0.0},
+    'Farmer_Photo_Size_KB': {'type': 'float', 'min': 0.0},
+    'Plot_Photo_Size_KB': {'type': 'float', 'min': 0.0},
+    'Record_Created': {'type': 'date', 'format': '%Y-%m-%d'},
+    'VDV_Timestamp': {'type': 'date', 'format': '%Y-%m-%d %H:%M:%S'},
+    'Aadhaar_Verified': {'type': 'bool'},
+    'Proxy_Verification': {'type': 'bool'}
+}
+SCHEMA_TYPED_ATTR = 'schema_typed'
+
+def _has_schema_type(values, kind):
+    if kind == 'float':
+        return pd.api.types.is_float_dtype(values)
+    if kind == 'date':
+        return pd.api.types.is_datetime64_any_dtype(values)
+    if kind == 'bool':
+        return values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) in ('boolean', 'empty')
+    return False
+
+def coerce_to_schema(df):
+    """Coerces USER_COLUMNS per COLUMN_SCHEMA; returns (typed df, rejection report).
+
+    The result is tagged in df.attrs (kept by copies and row slices), so a frame that was already
+    coerced passes straight through; otherwise typed float/date/bool columns are kept as they are.
+
+    The report has one row per rejected record: Row (1-based data row), Columns, Detail.
+    """
+    df = df.copy()
+    if df.attrs.get(SCHEMA_TYPED_ATTR):
+        return df, pd.DataFrame(columns=['Row', 'Columns', 'Detail'])
+    df.attrs[SCHEMA_TYPED_ATTR] = True
+    rejected = []
+    for col in USER_COLUMNS:
+        raw = df[col] if col in df.columns else pd.Series(np.nan, index=df.index, dtype=object)
+        spec = COLUMN_SCHEMA.get(col, {'type': 'str'})
+        if col in df.columns and _has_schema_type(raw, spec['type']):
+            continue
+        text = raw.astype("string").str.strip()
+        is_null = text.isna() | text.str.upper().isin(NULL_TOKENS)
+        if spec['type'] == 'str':
+            # Free text keeps '' as its null: FIDs, Entity_Keys and the rotation check stringify values
+            df[col] = raw.astype(object).where(~is_null, "")
+            continue
+        if spec['type'] == 'float':
+            typed = pd.to_numeric(text.mask(is_null), errors='coerce').astype(float)
+            bad = typed.isna() & ~is_null
+            out_of_range = pd.Series(False, index=df.index)
+            if 'min' in spec:
+                out_of_range |= typed < spec['min']
+            if 'max' in spec:
+                out_of_range |= typed > spec['max']
+            reason = pd.Series("not a number", index=df.index).mask(out_of_range, "out of range")
+            bad |= out_of_range
+            typed = typed.mask(out_of_range)
+        elif spec['type'] == 'date':
+            typed = pd.to_datetime(text.mask(is_null), format=spec['format'], errors='coerce')
+            bad = typed.isna() & ~is_null
+            reason = pd.Series(f"expected {spec['format']}", index=df.index)
+        else:
+            # object True/False/NaN rather than the nullable "boolean" dtype, which the display fillna("NA") rejects
+            typed = text.str.upper().map(BOOL_TOKENS).astype(object)
+            bad = typed.isna() & ~is_null
+            reason = pd.Series("expected Yes/No", index=df.index)
+        df[col] = typed
+        if bad.any():
+            rejected.append(pd.DataFrame({
+                'Position': np.flatnonzero(bad.to_numpy()),
+                'Column': col,
+                'Detail': col + "=" + text[bad].astype(str).str.slice(0, 40).to_numpy() + " (" + reason[bad].to_numpy() + ")"
+            }))
+    if not rejected:
+        return df, pd.DataFrame(columns=['Row', 'Columns', 'Detail'])
+    long = pd.concat(rejected, ignore_index=True).sort_values('Position', kind='stable')
+    report = long.groupby('Position', sort=True).agg(Columns=('Column', ", ".join), Detail=('Detail', "; ".join)).reset_index()
+    report.insert(0, 'Row', report.pop('Position') + 1)
+    return df, report
+
+def read_csv_robust(uploaded_file):
+    """Robust CSV reader handling extra header rows; every field is read as raw text."""
     try:
-        df = pd.read_csv(uploaded_file)
-        header_found = any("Khevat" in str(c) for c in df.columns)
-        if header_found:
-            for col in USER_COLUMNS:
-                if col not in df.columns:
-                    df[col] = ""
+        df = pd.read_csv(uploaded_file, dtype=str, keep_default_na=False)
+        if any("Khevat" in str(c) for c in df.columns):
             return df
-        uploaded_file.seek(0)
-        df = pd.read_csv(uploaded_file, header=2)
-        for col in USER_COLUMNS:
-            if col not in df.columns:
-                df[col] = ""
-        return df
-    except:
-        uploaded_file.seek(0)
-        df = pd.read_csv(uploaded_file, header=2)
-        for col in USER_COLUMNS:
-            if col not in df.columns:
-                df[col] = ""
-        return df
+    except Exception:
+        pass
+    uploaded_file.seek(0)
+    return pd.read_csv(uploaded_file, header=2, dtype=str, keep_default_na=False)
+
+def load_data_validated(uploaded_file):
+    """Reads a verified CSV and coerces it to COLUMN_SCHEMA; returns (typed df, rejection report)."""
+    return coerce_to_schema(read_csv_robust(uploaded_file))
+
+def load_data_robust(uploaded_file):
+    """Robust CSV loader handling extra header rows; returns the schema-typed frame."""
+    return load_data_validated(uploaded_file)[0]
 
 def run_ocr_pipeline(uploaded_file):
     """Simulated OCR extraction for demo purposes"""
@@ -547,8 +1136,1538 @@ def run_ocr_pipeline(uploaded_file):
             df_result[col] = ""
     return df_result, "Success: Extracted {} records".format(len(df_result))
 
+# ------------------------------
+# BATCH INGESTION (MANY FILES / ZIP)
+# ------------------------------
+
+INGEST_MAX_WORKERS = 4
+
+def expand_uploads(uploaded_files, extensions):
+    """Flattens uploads and ZIP archives into unique (name, bytes) items; unreadable archives carry None."""
+    items, seen = [], {}
+    def add(name, data):
+        seen[name] = seen.get(name, 0) + 1
+        items.append((name if seen[name] == 1 else f"{name} #{seen[name]}", data))
+    for f in uploaded_files or []:
+        data = f.getvalue()
+        if f.name.lower().endswith(".zip"):
+            try:
+                with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                    for info in zf.infolist():
+                        inner = info.filename
+                        if info.is_dir() or inner.startswith("__MACOSX/") or not inner.lower().endswith(extensions):
+                            continue
+                        add(f"{f.name}/{inner}", zf.read(info))
+            except zipfile.BadZipFile:
+                add(f.name, None)
+        else:
+            add(f.name, data)
+    return items
+
+def ocr_file_worker(name, data):
+    """Phase 1 worker: OCR one Jamabandi PDF."""
+    df_ocr, status = run_ocr_pipeline(io.BytesIO(data))
+    df_ocr['Source_File'] = name
+    return df_ocr, status
+
+def run_file_batch(items, worker, on_progress=None, max_workers=INGEST_MAX_WORKERS):
+    """Runs worker(name, data) -> (frame, ...) over items on a thread pool.
+
+    A failing file is recorded in the progress table instead of aborting the batch.
+    on_progress(progress_df) is called from the calling thread as files start and finish.
+    Returns ({name: worker result} for successful files, progress_df).
+    """
+    progress = {name: {"File": name, "Status": "QUEUED", "Records": 0, "Seconds": 0.0, "Message": ""}
+                for name, _ in items}
+    started = {}
+
+    def run_one(name, data):
+        started[name] = time.time()
+        progress[name]["Status"] = "RUNNING"
+        if data is None:
+            raise ValueError("Unreadable archive")
+        return worker(name, data)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {pool.submit(run_one, name, data): name for name, data in items}
+        while pending:
+            done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = pending.pop(fut)
+                entry = progress[name]
+                entry["Seconds"] = round(time.time() - started.get(name, time.time()), 2)
+                try:
+                    results[name] = fut.result()
+                    entry["Status"] = "DONE"
+                    entry["Records"] = len(results[name][0])
+                    if len(results[name]) > 1 and isinstance(results[name][1], str):
+                        entry["Message"] = results[name][1]
+                except Exception as exc:
+                    entry["Status"] = "FAILED"
+                    entry["Message"] = f"{type(exc).__name__}: {exc}"
+            if on_progress:
+                on_progress(pd.DataFrame(progress.values()))
+    return results, pd.DataFrame(progress.values())
+
+# ============================================================
+# MODULE 3: PERSISTENT REGISTRY INDEXES
+# ============================================================
+
+DATA_DIR = Path(__file__).resolve().parent / "agristack_data"
+
+def _clean_token(value):
+    """Normalizes registry tokens; blanks, NaN and the mobile 'NA' placeholder become ''."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    token = str(value).strip()
+    return "" if token.upper() in ("", "NA", "NAN") else token
+
+def open_index_db(path):
+    """SQLite connection for a persistent index; callers serialize access with their own lock."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def identity_person_key(entity_key):
+    """Drops the LGD and device parts of an Entity_Key so one farmer matches across districts.
+
+    Rows without a parentage get no key: a bare name is too weak to link two districts.
+    """
+    parts = str(entity_key).split("|")
+    if len(parts) < 2 or parts[0].strip() == "" or parts[1].strip() == "":
+        return ""
+    return f"{parts[0]}|{parts[1]}"
+
+class IdentityIndex:
+    """Persistent identity index: one (person key, F-ID) row holding its latest district and LGD.
+
+    A batch only writes its own rows, and re-uploading an F-ID replaces its district and
+    LGD, so a corrected record stops counting towards cross-district conflicts. A batch is
+    looked up before its run is published and written when it is, and a write can be taken
+    back with restore() if the publication fails.
+    """
+
+    FIELDS = ("districts", "lgds", "fids")
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._db = open_index_db(self.root / "identity.sqlite3")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS identity (
+            person_key TEXT NOT NULL, fid TEXT NOT NULL, district TEXT NOT NULL, lgd TEXT NOT NULL,
+            PRIMARY KEY (person_key, fid)) WITHOUT ROWID""")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _batch_rows(records):
+        rows = {}
+        for key, district, lgd, fid in records:
+            fid = _clean_token(fid)
+            if key and fid:
+                rows[(key, fid)] = (_clean_token(district), _clean_token(lgd))
+        return rows
+
+    def _stored(self, keys):
+        """{(key, fid): (district, lgd)} of every stored row under keys."""
+        keys = sorted(keys)
+        stored = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            for key, fid, district, lgd in self._db.execute(
+                    f"SELECT person_key, fid, district, lgd FROM identity WHERE person_key IN ({','.join('?' * len(chunk))})", chunk):
+                stored[(key, fid)] = (district, lgd)
+        return stored
+
+    def lookup(self, records):
+        """Indexed entry for every key of a (key, district, lgd, fid) batch as it reads once the batch is upserted.
+
+        Nothing is written.
+        """
+        rows = self._batch_rows(records)
+        with self._lock:
+            merged = {**self._stored({key for key, _ in rows}), **rows}
+        entries = {}
+        for (key, fid), (district, lgd) in sorted(merged.items()):
+            entry = entries.setdefault(key, {field: [] for field in self.FIELDS})
+            for field, value in zip(self.FIELDS, (district, lgd, fid)):
+                if value and value not in entry[field]:
+                    entry[field].append(value)
+        return entries
+
+    def upsert(self, records):
+        """Stores (key, district, lgd, fid) records; returns the token restore() takes to undo the write."""
+        rows = self._batch_rows(records)
+        with self._lock:
+            stored = self._stored({key for key, _ in rows})
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO identity VALUES (?, ?, ?, ?)",
+                                     (pair + row for pair, row in rows.items()))
+        return list(rows), {pair: stored[pair] for pair in rows if pair in stored}
+
+    def restore(self, token):
+        """Takes back one upsert(): its rows get their earlier district and LGD, or are removed."""
+        pairs, previous = token
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM identity WHERE person_key = ? AND fid = ?", pairs)
+            self._db.executemany("INSERT INTO identity VALUES (?, ?, ?, ?)", (pair + row for pair, row in previous.items()))
+
+@st.cache_resource
+def get_identity_index():
+    """Process-wide identity index shared by all sessions."""
+    return IdentityIndex(DATA_DIR / "identity_index")
+
+FID_HASH_WIDTHS = (6, 8, 10, 12, 16, 24, 32, 64)
+
+class FidCollisionIndex:
+    """Persistent F-ID ownership index: one (base F-ID, identity digest) row per assigned F-ID.
+
+    Every ID derived from one 6-hex base (the base itself and its widened forms) is stored
+    under that base, so checking and claiming an ID reads only the batch's bases. The first
+    identity keeps the base ID; a different identity on the same base gets the shortest
+    free widening of its own hash, and only as a last resort a numeric suffix. A batch
+    inserts only its newly claimed rows, and the F-ID column is UNIQUE.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._db = open_index_db(self.root / "fid_index.sqlite3")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS fid_owner (
+            base TEXT NOT NULL, owner TEXT NOT NULL, fid TEXT NOT NULL UNIQUE,
+            PRIMARY KEY (base, owner)) WITHOUT ROWID""")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _claim(bucket, lgd, digest):
+        taken = set(bucket.values())
+        for width in FID_HASH_WIDTHS:
+            fid = f"JK-FID-{lgd}-{digest[:width].upper()}"
+            if fid not in taken:
+                return fid
+        suffix = 2
+        while f"{fid}-{suffix}" in taken:
+            suffix += 1
+        return f"{fid}-{suffix}"
+
+    def assign(self, records):
+        """F-IDs for (name, village_code, device_id, parentage) records; returns (fids, collision flags).
+
+        Identities already in the index get their recorded ID. New identities are claimed in
+        digest order, so which one keeps a contested base ID does not depend on row order.
+        """
+        keyed = []
+        for name, village_code, device_id, parentage in records:
+            lgd = str(village_code).strip().upper()
+            digest = fid_identity_digest(name, device_id, parentage)
+            keyed.append((f"JK-FID-{lgd}-{digest[:6].upper()}", lgd, digest))
+        bases = sorted({base for base, _, _ in keyed})
+        fids = [None] * len(keyed)
+        claimed = []
+        with self._lock:
+            buckets = {base: {} for base in bases}
+            for start in range(0, len(bases), 500):
+                chunk = bases[start:start + 500]
+                for base, owner, fid in self._db.execute(
+                        f"SELECT base, owner, fid FROM fid_owner WHERE base IN ({','.join('?' * len(chunk))})", chunk):
+                    buckets[base][owner] = fid
+            for i in sorted(range(len(keyed)), key=lambda i: keyed[i][2]):
+                base, lgd, digest = keyed[i]
+                bucket = buckets[base]
+                owner = digest[:32]
+                if owner not in bucket:
+                    bucket[owner] = self._claim(bucket, lgd, digest)
+                    claimed.append((base, owner, bucket[owner]))
+                fids[i] = bucket[owner]
+            with self._db:
+                self._db.executemany("INSERT INTO fid_owner VALUES (?, ?, ?)", claimed)
+        return fids, [fid != base for fid, (base, _, _) in zip(fids, keyed)]
+
+@st.cache_resource
+def get_fid_index():
+    """Process-wide F-ID collision index shared by Phase 2 jobs and VDV registration."""
+    return FidCollisionIndex(DATA_DIR / "fid_index")
+
+def identity_index_records(df_final):
+    """(person key, district, lgd, fid) per scored row, as the identity index stores them."""
+    person_keys = df_final['Entity_Key'].map(identity_person_key)
+    lgds = df_final['LGD_Code'].map(_clean_token)
+    lgds = lgds.where(lgds != "", df_final['Village_Code'].map(_clean_token))
+    return list(zip(person_keys, df_final['District'], lgds, df_final['AgriStack_FID']))
+
+def apply_identity_index(df_final, index):
+    """Flags cross-district conflicts against the identity index as it will read with this batch in it.
+
+    The batch itself is written when its run is published.
+    """
+    df_final = df_final.copy()
+    person_keys = df_final['Entity_Key'].map(identity_person_key)
+    entries = index.lookup(identity_index_records(df_final))
+    districts = person_keys.map(lambda k: entries.get(k, {}).get('districts', []))
+    df_final['Indexed_Districts'] = districts.map(lambda d: ",".join(d))
+    df_final['Indexed_FIDs'] = person_keys.map(lambda k: ",".join(entries.get(k, {}).get('fids', [])))
+    df_final['Cross_District_Dedupe_Flag'] = districts.map(len) > 1
+    return df_final
+
+GRIEVANCE_PRIORITY_RANK = {"High": 0, "Medium": 1, "Low": 2}
+GRIEVANCE_PAGE_SIZE = 25
+GRIEVANCE_OPEN_STATUS = "PANCHAYAT_REVIEW"
+
+def build_fid_lookup(farmer_registry):
+    """O(1) F-ID -> registry summary (owner, village, channel, Audit_Trace) for grievance validation."""
+    cols = [c for c in ['Owner_Name', 'Village_Code', 'Governance_Channel', 'Audit_Trace'] if c in farmer_registry.columns]
+    return farmer_registry.drop_duplicates('AgriStack_FID').set_index('AgriStack_FID')[cols].to_dict('index')
+
+class GrievanceStore:
+    """Grievance records persisted in SQLite under agristack_data/grievances/, with a priority heap over open ones.
+
+    Heap entries are (priority rank, submission time, sequence, ID); resolved grievances are
+    dropped lazily and the heap is rebuilt once stale entries outnumber open ones. The heap is
+    rebuilt from the table when the store is opened, so the queue survives a restart.
+    """
+
+    def __init__(self, root):
+        self._records = {}
+        self._heap = []
+        self._seq = 0
+        self._open = 0
+        self._lock = threading.Lock()
+        self._db = open_index_db(Path(root) / "grievances.sqlite3")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS grievance (
+            seq INTEGER PRIMARY KEY, grievance_id TEXT UNIQUE NOT NULL, status TEXT NOT NULL, record TEXT NOT NULL)""")
+        self._db.commit()
+        for seq, status, payload in self._db.execute("SELECT seq, status, record FROM grievance ORDER BY seq"):
+            record = {**json.loads(payload), "Status": status}
+            self._records[record["Grievance_ID"]] = record
+            self._seq = seq
+            if status == GRIEVANCE_OPEN_STATUS:
+                self._heap.append(self._heap_entry(record, seq))
+                self._open += 1
+        heapq.heapify(self._heap)
+
+    @staticmethod
+    def _heap_entry(record, seq):
+        return (GRIEVANCE_PRIORITY_RANK.get(record["Priority"], len(GRIEVANCE_PRIORITY_RANK)),
+                record["_submitted_ts"], seq, record["Grievance_ID"])
+
+    def submit(self, fid, name, contact, priority, details, registry_entry):
+        """Adds a grievance for a validated F-ID, linked to its registry channel and Audit_Trace."""
+        with self._lock:
+            self._seq += 1
+            submitted = datetime.now()
+            gid = f"GRV-{self._seq:06d}"
+            record = {
+                "Grievance_ID": gid,
+                "AgriStack_FID": fid,
+                "Owner_Name": registry_entry.get('Owner_Name', ''),
+                "Village_Code": registry_entry.get('Village_Code', ''),
+                "Governance_Channel": registry_entry.get('Governance_Channel', ''),
+                "Audit_Trace": registry_entry.get('Audit_Trace', ''),
+                "Name": name,
+                "Contact": contact,
+                "Priority": priority,
+                "Details": details,
+                "Status": GRIEVANCE_OPEN_STATUS,
+                "Submitted": submitted.strftime("%Y-%m-%d %H:%M:%S"),
+                "_submitted_ts": submitted.timestamp()
+            }
+            with self._db:
+                self._db.execute("INSERT INTO grievance VALUES (?, ?, ?, ?)",
+                                 (self._seq, gid, record["Status"], json.dumps(record, default=str)))
+            self._records[gid] = record
+            heapq.heappush(self._heap, self._heap_entry(record, self._seq))
+            self._open += 1
+            return dict(record)
+
+    def resolve(self, gid, status="RESOLVED"):
+        with self._lock:
+            record = self._records.get(gid)
+            if record is None or record["Status"] != GRIEVANCE_OPEN_STATUS:
+                return False
+            with self._db:
+                self._db.execute("UPDATE grievance SET status = ? WHERE grievance_id = ?", (status, gid))
+            record["Status"] = status
+            self._open -= 1
+            if len(self._heap) > 2 * self._open + 64:
+                self._heap = [e for e in self._heap if self._records[e[3]]["Status"] == GRIEVANCE_OPEN_STATUS]
+                heapq.heapify(self._heap)
+            return True
+
+    @property
+    def open_count(self):
+        with self._lock:
+            return self._open
+
+    @property
+    def total_count(self):
+        with self._lock:
+            return len(self._records)
+
+    def page(self, page_no, page_size=GRIEVANCE_PAGE_SIZE):
+        """One page of open grievances in priority order, via a bounded heap selection."""
+        with self._lock:
+            wanted = (page_no + 1) * page_size
+            top, stale = [], 0
+            while len(top) < wanted:
+                batch = heapq.nsmallest(wanted + stale, self._heap)
+                top = [e for e in batch if self._records[e[3]]["Status"] == GRIEVANCE_OPEN_STATUS]
+                if len(batch) < wanted + stale:
+                    break
+                stale = len(batch) - len(top)
+            now = time.time()
+            rows = []
+            for entry in top[page_no * page_size:wanted]:
+                record = {k: v for k, v in self._records[entry[3]].items() if not k.startswith("_")}
+                record["Age_Hours"] = round((now - self._records[entry[3]]["_submitted_ts"]) / 3600, 1)
+                rows.append(record)
+            return pd.DataFrame(rows)
+
+WALL_RESULT_LIMIT = 25
+_HONORIFICS = re.compile(r'\b(sardar|shri|smt|mr|mrs|late|sh)\b\.?')
+_TRANSLIT_RULES = [
+    (re.compile(r'ee'), 'i'), (re.compile(r'oo'), 'u'), (re.compile(r'aa'), 'a'),
+    (re.compile(r'ph'), 'f'), (re.compile(r'gh'), 'g'), (re.compile(r'w'), 'v'), (re.compile(r'q'), 'k'),
+    (re.compile(r'([a-z])\1+'), r'\1')
+]
+
+def normalize_transliteration(text):
+    """Folds common Urdu-to-Latin spelling variants (Ghulam/Gulaam, Vijay/Wijay) to one form."""
+    t = _HONORIFICS.sub(' ', str(text).lower())
+    t = re.sub(r'[^a-z0-9 ]', ' ', t)
+    for pattern, repl in _TRANSLIT_RULES:
+        t = pattern.sub(repl, t)
+    return t.split()
+
+def _sorted_unique(keys):
+    """Sorted distinct int64 keys (sort + mask; cheaper than np.unique's hashing on large arrays)."""
+    keys = np.sort(keys)
+    return keys[np.r_[True, keys[1:] != keys[:-1]]] if len(keys) else keys
+
+def _trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class WallSearchIndex:
+    """In-memory search over Owner_Name (transliteration-normalized), Khasra_No, F-ID and Village_Code.
+
+    Holds a sorted vocabulary with per-token row ranges for prefix lookups, and trigram
+    postings (one sorted row array sliced per trigram) for fuzzy lookups; a query touches
+    only the postings of its own terms.
+    """
+
+    def __init__(self, df):
+        self.n = len(df)
+        names = df['Owner_Name'] if 'Owner_Name' in df.columns else pd.Series("", index=df.index)
+        names = names.reset_index(drop=True)
+        parts = [_map_unique(names, normalize_transliteration).explode()]
+        for col in ['Khasra_No', 'AgriStack_FID', 'Village_Code']:
+            if col in df.columns:
+                parts.append(df[col].reset_index(drop=True).astype(str).str.strip().str.lower())
+        tokens = pd.concat(parts)
+        tokens = tokens[tokens.notna() & ~tokens.isin(["", "na", "nan"])]
+        n = max(self.n, 1)
+
+        # Distinct (token, row) pairs as int64 keys, sorted by token then row
+        token_codes, vocab = pd.factorize(tokens.to_numpy(dtype=object), sort=True)
+        pairs = _sorted_unique(token_codes.astype(np.int64) * n + tokens.index.to_numpy(dtype=np.int64))
+        pair_tokens, self._token_rows = pairs // n, pairs % n
+        self._tokens = list(vocab)
+        self._token_bounds = np.searchsorted(pair_tokens, np.arange(len(vocab) + 1))
+
+        # Trigrams are generated once per distinct token, then expanded to that token's rows
+        gram_lists = [list(_trigrams(t)) for t in self._tokens]
+        gram_counts = np.fromiter((len(g) for g in gram_lists), dtype=np.int64, count=len(gram_lists))
+        gram_codes, gram_vocab = pd.factorize(pd.Series([g for gl in gram_lists for g in gl], dtype=object))
+        gram_start = np.r_[0, np.cumsum(gram_counts)]
+        reps = gram_counts[pair_tokens]
+        pair_idx = np.repeat(np.arange(len(pairs)), reps)
+        within = np.arange(len(pair_idx)) - np.repeat(np.cumsum(reps) - reps, reps)
+        grams = gram_codes[gram_start[pair_tokens[pair_idx]] + within].astype(np.int64)
+        gram_pairs = _sorted_unique(grams * n + self._token_rows[pair_idx])
+        gram_of, self._posting_rows = gram_pairs // n, gram_pairs % n
+        bounds = np.searchsorted(gram_of, np.arange(len(gram_vocab) + 1))
+        self._postings = {g: (bounds[i], bounds[i + 1]) for i, g in enumerate(gram_vocab)}
+        self._doc_grams = np.bincount(self._posting_rows, minlength=self.n)
+
+    def search(self, query, limit=WALL_RESULT_LIMIT):
+        """Top matching row positions and scores: trigram Jaccard plus a bonus per prefix-matched term."""
+        raw = str(query).strip().lower()
+        terms = set(normalize_transliteration(raw)) | {t for t in raw.split() if t}
+        if self.n == 0 or not terms:
+            return np.array([], dtype=np.int64), np.array([])
+        q_grams = set()
+        for term in terms:
+            q_grams |= _trigrams(term)
+        hits = [self._posting_rows[slice(*self._postings[g])] for g in q_grams if g in self._postings]
+        shared = np.bincount(np.concatenate(hits), minlength=self.n) if hits else np.zeros(self.n)
+        score = shared / np.maximum(len(q_grams) + self._doc_grams - shared, 1)
+
+        prefix_terms = np.zeros(self.n)
+        for term in terms:
+            if len(term) < 2:
+                continue
+            lo = bisect.bisect_left(self._tokens, term)
+            hi = bisect.bisect_left(self._tokens, term + "\uffff")
+            if hi > lo:
+                hit = np.zeros(self.n, dtype=bool)
+                hit[self._token_rows[self._token_bounds[lo]:self._token_bounds[hi]]] = True
+                prefix_terms += hit
+        score = score + prefix_terms / len(terms)
+
+        candidates = np.flatnonzero(score > 0.2)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-score[candidates], limit - 1)[:limit]]
+        order = candidates[np.argsort(-score[candidates], kind="stable")]
+        return order, score[order]
+
+def build_governance_outputs(df_final, map_data, identity_index, overlap_radius_m=GIS_OVERLAP_RADIUS_M):
+    """Registries, dedupe/conflict flags, GIS overlaps and queue snapshots for one scored run."""
+    # Registries
+    df_ranked = df_final.sort_values(by=['Trust_Score'], ascending=False)
+    farmer_registry = df_ranked.groupby('AgriStack_FID', as_index=False).first()
+    plot_registry = df_ranked.groupby('Plot_ID', as_index=False).first()
+    crop_registry = df_final[['AgriStack_FID','Plot_ID','Season','Crop_Sown','Village_Code','LGD_Code']].copy()
+
+    # Dedupe and conflicts
+    entity_counts = df_final.groupby('Entity_Key').size().reset_index(name='Entity_Count')
+    df_final = df_final.merge(entity_counts, on='Entity_Key', how='left')
+    df_final = apply_identity_index(df_final, identity_index)
+    df_final['Conflict_Flag'] = df_final['Entity_Count'] > 1
+
+    # GIS overlap detection
+    plot_counts = df_final.groupby('Plot_ID').size().reset_index(name='Plot_Count')
+    df_final = df_final.merge(plot_counts, on='Plot_ID', how='left')
+    df_final, gis_pairs = detect_plot_overlaps(df_final, overlap_radius_m)
+    df_final['GIS_Overlap_Flag'] = (df_final['Plot_Count'] > 1) | df_final['GIS_Proximity_Flag']
+
+    # Queue snapshots
+    return {
+        'df_final': df_final,
+        'map_data': map_data,
+        'farmer_registry': farmer_registry,
+        'plot_registry': plot_registry,
+        'crop_registry': crop_registry,
+        'amber_queue': df_final[df_final['Workflow_Queue'] == 'BLOCK_TECH_UNIT'],
+        'grey_queue': df_final[df_final['Workflow_Queue'] == 'MUTATION_FOLLOWUP'],
+        'red_queue': df_final[df_final['Workflow_Queue'] == 'AUDIT_QUEUE'],
+        'gis_queue': df_final[df_final['GIS_Overlap_Flag'] == True],
+        'super_check_queue': df_final[df_final['Super_Check_Selected'] == True],
+        'gis_pairs': gis_pairs
+    }
+
+@st.cache_resource
+def get_grievance_store():
+    """Process-wide grievance store, so every Panchayat session feeds one queue."""
+    return GrievanceStore(DATA_DIR / "grievances")
+
+# ------------------------------
+# CONTENT-ADDRESSED PHOTO STORE
+# ------------------------------
+
+PHOTO_CHUNK_BYTES = 256 * 1024
+PHOTO_THUMBNAIL_PX = 160
+
+class PhotoStore:
+    """Geo-tagged captures stored once per SHA-256 under blobs/<ab>/<sha>, each with a JPEG thumbnail.
+
+    Uploads are streamed to disk in chunks while hashing, so records carry only the hash and
+    a photo captured twice (re-sync, retake of the same file) costs no extra storage.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        (self.root / "blobs").mkdir(parents=True, exist_ok=True)
+        (self.root / "thumbs").mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def blob_path(self, sha):
+        return self.root / "blobs" / sha[:2] / sha
+
+    def thumbnail_path(self, sha):
+        return self.root / "thumbs" / sha[:2] / f"{sha}.jpg"
+
+    def put(self, fileobj):
+        """Streams a file-like object into the store; returns (sha256, size_bytes, is_new)."""
+        digest = hashlib.sha256()
+        size = 0
+        tmp = self.root / f"incoming_{threading.get_ident()}_{time.time_ns()}.tmp"
+        fileobj.seek(0)
+        with open(tmp, "wb") as out:
+            for chunk in iter(lambda: fileobj.read(PHOTO_CHUNK_BYTES), b""):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        sha = digest.hexdigest()
+        path = self.blob_path(sha)
+        with self._lock:
+            is_new = not path.exists()
+            if is_new:
+                path.parent.mkdir(exist_ok=True)
+                tmp.replace(path)
+            else:
+                tmp.unlink()
+        if not self.thumbnail_path(sha).exists():
+            self._make_thumbnail(sha)
+        return sha, size, is_new
+
+    def _make_thumbnail(self, sha):
+        thumb = self.thumbnail_path(sha)
+        thumb.parent.mkdir(exist_ok=True)
+        try:
+            with Image.open(self.blob_path(sha)) as img:
+                # JPEG draft mode decodes at a reduced scale instead of full resolution
+                img.draft("RGB", (PHOTO_THUMBNAIL_PX, PHOTO_THUMBNAIL_PX))
+                small = ImageOps.exif_transpose(img).convert("RGB")
+                small.thumbnail((PHOTO_THUMBNAIL_PX, PHOTO_THUMBNAIL_PX))
+                tmp = thumb.with_suffix(f".{threading.get_ident()}.tmp")
+                small.save(tmp, "JPEG", quality=80)
+                tmp.replace(thumb)
+            return True
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # Undecodable or oversized upload: the original blob is kept for audit, just without a preview
+            return False
+
+    def thumbnail(self, sha):
+        """Thumbnail bytes for a stored hash, or None when absent."""
+        sha = _clean_token(sha)
+        path = self.thumbnail_path(sha) if sha else None
+        return path.read_bytes() if path is not None and path.exists() else None
+
+@st.cache_resource
+def get_photo_store():
+    """Process-wide photo store shared by all VDV sessions."""
+    return PhotoStore(DATA_DIR / "photos")
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def load_photo_thumbnail(sha):
+    """Lazily loaded, cached thumbnail bytes for one photo hash."""
+    return get_photo_store().thumbnail(sha)
+
+def store_captured_photo(uploaded):
+    """Streams an st.file_uploader capture into the photo store; returns (name, size_kb, sha256)."""
+    if uploaded is None:
+        return "NA", "NA", "NA"
+    sha, size, _ = get_photo_store().put(uploaded)
+    return uploaded.name, int(size / 1024), sha
+
+# ------------------------------
+# CHANNEL AND ELIGIBILITY CUBE
+# ------------------------------
+
+CUBE_GEO_LEVELS = ('District', 'Tehsil', 'Village_Code')
+CUBE_MEASURES = ('Records', 'Declared_Area_SqM', 'KCC_Eligible', 'PM_KISAN_Eligible', 'PMFBY_Eligible')
+CUBE_ROW_KEY = ('AgriStack_FID', 'Plot_ID', 'Season')
+CUBE_CONTRIB_COLUMNS = CUBE_GEO_LEVELS + ('Channel',) + CUBE_MEASURES[1:]
+
+class AggregateCube:
+    """Materialized rollups of records, declared area and scheme eligibility per Governance_Channel.
+
+    Each rollup level (all, District, District/Tehsil, District/Tehsil/Village_Code) maps a
+    geography to a CHANNELS x CUBE_MEASURES vector. Batches are folded in as they are scored,
+    so dashboard reads are dictionary lookups independent of registry size. A keyed cube
+    remembers each record's last contribution under CUBE_ROW_KEY (with Season in its
+    canonical label) and retracts it when the record is re-scored. Given a path, a keyed cube
+    persists those contributions in SQLite: a batch writes only its own rows, and the rollups
+    are rebuilt from them on open.
+    """
+
+    def __init__(self, keyed=False, path=None):
+        self.keyed = keyed
+        self._rollups = [{} for _ in range(len(CUBE_GEO_LEVELS) + 1)]
+        self._children = {}
+        self._rows = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if keyed and path is not None:
+            self._db = open_index_db(path)
+            self._db.execute(f"""CREATE TABLE IF NOT EXISTS cube_row (
+                {', '.join(f'{k} TEXT NOT NULL' for k in CUBE_ROW_KEY)}, {', '.join(CUBE_CONTRIB_COLUMNS)},
+                PRIMARY KEY ({', '.join(CUBE_ROW_KEY)})) WITHOUT ROWID""")
+            self._db.commit()
+            stored = pd.read_sql_query("SELECT * FROM cube_row", self._db)
+            if len(stored) > 0:
+                keys = self._row_keys(stored)
+                contrib = stored[list(CUBE_CONTRIB_COLUMNS)].set_axis(keys)
+                if keys != list(stored[list(CUBE_ROW_KEY)].itertuples(index=False, name=None)):
+                    # Rows stored under an older season spelling are merged into their canonical key
+                    contrib = contrib[~contrib.index.duplicated(keep="last")]
+                    with self._db:
+                        self._db.execute("DELETE FROM cube_row")
+                        self._write_rows(zip(contrib.index, contrib.itertuples(index=False, name=None)))
+                self._rows.update(zip(contrib.index, contrib.itertuples(index=False, name=None)))
+                self._accumulate(contrib, 1)
+
+    @staticmethod
+    def _row_keys(frame):
+        """CUBE_ROW_KEY tuples per row, with tokens cleaned and Season in its canonical label."""
+        return list(zip(*(_map_unique(frame[k], season_label if k == 'Season' else _clean_token) for k in CUBE_ROW_KEY)))
+
+    def _write_rows(self, items):
+        """Stores (key, contribution) pairs; callers hold the connection's transaction."""
+        self._db.executemany(
+            f"INSERT OR REPLACE INTO cube_row VALUES ({','.join('?' * (len(CUBE_ROW_KEY) + len(CUBE_CONTRIB_COLUMNS)))})",
+            (key + row for key, row in items))
+
+    @staticmethod
+    def _contributions(frame):
+        """Per-row (geo..., channel index, measures...) for a scored batch."""
+        out = pd.DataFrame({level: frame[level].map(_clean_token).replace("", "NA") for level in CUBE_GEO_LEVELS})
+        out['Channel'] = frame['Governance_Channel'].map({c: i for i, c in enumerate(CHANNELS)}).fillna(CHANNELS.index("RED")).astype(int)
+        out['Declared_Area_SqM'] = pd.to_numeric(frame['Declared_Area_SqM'], errors="coerce").fillna(0.0)
+        for col in CUBE_MEASURES[2:]:
+            # "True" also matches the text form of a display-frame flag
+            out[col] = frame[col].astype(str).eq("True").astype(int)
+        return out
+
+    def _accumulate(self, contrib, sign):
+        n = len(contrib)
+        if n == 0:
+            return
+        width = len(CUBE_MEASURES)
+        vectors = np.zeros((n, len(CHANNELS) * width))
+        base = contrib['Channel'].to_numpy() * width
+        rows = np.arange(n)
+        vectors[rows, base] = sign
+        for offset, col in enumerate(CUBE_MEASURES[1:], start=1):
+            vectors[rows, base + offset] = sign * contrib[col].to_numpy(dtype=float)
+        for depth, rollup in enumerate(self._rollups):
+            if depth == 0:
+                groups = [((), vectors.sum(axis=0))]
+            else:
+                keys = list(CUBE_GEO_LEVELS[:depth])
+                summed = pd.DataFrame(vectors).groupby([contrib[k].to_numpy() for k in keys], sort=False).sum()
+                groups = [(geo if isinstance(geo, tuple) else (geo,), vec) for geo, vec in zip(summed.index, summed.to_numpy())]
+            for geo, vec in groups:
+                cell = rollup.get(geo)
+                cell = vec.copy() if cell is None else cell + vec
+                if cell[::width].sum() <= 0:
+                    rollup.pop(geo, None)
+                    if depth:
+                        self._children.get(geo[:-1], set()).discard(geo[-1])
+                else:
+                    rollup[geo] = cell
+                    if depth:
+                        self._children.setdefault(geo[:-1], set()).add(geo[-1])
+
+    def apply(self, frame):
+        """Folds a batch of scored rows into the cube; on a keyed cube, re-scored records replace their previous contribution.
+
+        A keyed cube returns the token revert() takes to undo the batch.
+        """
+        if len(frame) == 0:
+            return ([], {}) if self.keyed else None
+        contrib = self._contributions(frame)
+        token = None
+        with self._lock:
+            if self.keyed:
+                contrib.index = pd.Index(self._row_keys(frame), tupleize_cols=False)
+                contrib = contrib[~contrib.index.duplicated(keep="last")]
+                rows = list(contrib.itertuples(index=False, name=None))
+                if self._db is not None:
+                    with self._db:
+                        self._write_rows(zip(contrib.index, rows))
+                previous = {k: self._rows[k] for k in contrib.index if k in self._rows}
+                if previous:
+                    self._accumulate(pd.DataFrame(list(previous.values()), columns=contrib.columns), -1)
+                self._rows.update(zip(contrib.index, rows))
+                token = (list(contrib.index), previous)
+            self._accumulate(contrib, 1)
+        return token
+
+    def revert(self, token):
+        """Undoes one keyed apply(): its rows go back to their earlier contribution, or are dropped."""
+        keys, previous = token
+        with self._lock:
+            current = [self._rows.pop(k) for k in keys if k in self._rows]
+            self._accumulate(pd.DataFrame(current, columns=list(CUBE_CONTRIB_COLUMNS)), -1)
+            self._accumulate(pd.DataFrame(list(previous.values()), columns=list(CUBE_CONTRIB_COLUMNS)), 1)
+            self._rows.update(previous)
+            if self._db is not None:
+                with self._db:
+                    self._db.executemany(f"DELETE FROM cube_row WHERE {' AND '.join(f'{k} = ?' for k in CUBE_ROW_KEY)}", keys)
+                    self._write_rows(previous.items())
+
+    def channel_summary(self, geo=()):
+        """Channel x measure table for one geography prefix, e.g. () or ('Srinagar', 'Srinagar')."""
+        geo = tuple(geo)
+        vec = self._rollups[len(geo)].get(geo)
+        values = np.zeros(len(CHANNELS) * len(CUBE_MEASURES)) if vec is None else vec
+        summary = pd.DataFrame(values.reshape(len(CHANNELS), len(CUBE_MEASURES)), index=CHANNELS, columns=list(CUBE_MEASURES))
+        summary['Declared_Area_SqM'] = summary['Declared_Area_SqM'].round(1)
+        return summary.astype({c: int for c in CUBE_MEASURES if c != 'Declared_Area_SqM'})
+
+    def channel_counts(self, geo=()):
+        """{channel: records} for one geography prefix."""
+        return self.channel_summary(geo)['Records'].to_dict()
+
+    def children(self, geo=()):
+        """Sorted next-level values under a geography prefix."""
+        return sorted(self._children.get(tuple(geo), ()))
+
+    def breakdown(self, geo=()):
+        """Records per channel for each child of a geography prefix."""
+        level = CUBE_GEO_LEVELS[len(geo)]
+        rows = [{level: child, **self.channel_counts(tuple(geo) + (child,))} for child in self.children(geo)]
+        return pd.DataFrame(rows, columns=[level] + CHANNELS)
+
+    def to_frame(self):
+        """Flat rollup table (one row per level and geography) for persisting with a snapshot."""
+        columns = [f"{c}__{m}" for c in CHANNELS for m in CUBE_MEASURES]
+        rows = []
+        for depth, rollup in enumerate(self._rollups):
+            for geo, vec in rollup.items():
+                padded = list(geo) + [""] * (len(CUBE_GEO_LEVELS) - depth)
+                rows.append([depth] + padded + vec.tolist())
+        return pd.DataFrame(rows, columns=['Level'] + list(CUBE_GEO_LEVELS) + columns)
+
+    @classmethod
+    def from_frame(cls, frame):
+        cube = cls()
+        for row in frame.itertuples(index=False, name=None):
+            depth, geo, vec = int(row[0]), tuple(row[1:1 + int(row[0])]), np.asarray(row[1 + len(CUBE_GEO_LEVELS):], dtype=float)
+            cube._rollups[depth][geo] = vec
+            if depth:
+                cube._children.setdefault(geo[:-1], set()).add(geo[-1])
+        return cube
+
+DISTRICT_CUBE_PATH = DATA_DIR / "cube" / "district_cube.sqlite3"
+
+@st.cache_resource
+def get_district_cube():
+    """Process-wide keyed cube across every published run; re-scored records replace their earlier scores."""
+    return AggregateCube(keyed=True, path=DISTRICT_CUBE_PATH)
+
+# ------------------------------
+# MULTI-SEASON CROP REGISTRY
+# ------------------------------
+
+CROP_REGISTRY_COLUMNS = ['AgriStack_FID', 'Plot_ID', 'Season', 'Crop_Sown', 'Village_Code', 'LGD_Code']
+CROP_SEASON_ORDER = {'RABI': 0, 'ZAID': 1, 'KHARIF': 2}
+
+def parse_season(season):
+    """(season, year) for a season label, e.g. ('Rabi', 2025) for 'Rabi 2025', 'RABI_2024-25' or 'rabi-25'.
+
+    Case and punctuation are ignored, and a split-year Rabi is dated by its harvest year.
+    Returns None when the label names no season and year.
+    """
+    text = re.sub(r"[^a-z0-9]+", " ", str(season).lower())
+    match = re.search(r"\b(rabi|zaid|kharif)\D*?(\d{4}|\d{2})(?: (\d{4}|\d{2}))?\b", text)
+    if not match:
+        return None
+    year = int(match.group(2))
+    year = year + 2000 if year < 100 else year
+    if match.group(3):
+        tail = match.group(3)
+        year = int(tail) if len(tail) == 4 else (year // 100) * 100 + int(tail)
+    return match.group(1).title(), year
+
+def season_label(season):
+    """Canonical 'Rabi 2025' form of a season label; unparseable labels are only cleaned."""
+    parsed = parse_season(season)
+    return f"{parsed[0]} {parsed[1]}" if parsed else _clean_token(season)
+
+def season_sort_key(season):
+    """(year, season) ordinal, so Kharif 2024 < Rabi 2025 < Zaid 2025 < Kharif 2025; None when unparseable."""
+    parsed = parse_season(season)
+    return (parsed[1], CROP_SEASON_ORDER[parsed[0].upper()]) if parsed else None
+
+def season_partition_name(season):
+    """Directory-safe partition name for a season label."""
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", season_label(season)).strip("_")
+    return f"season={slug or 'UNSPECIFIED'}"
+
+class CropSeasonRegistry:
+    """Append-only Crop Sown Registry partitioned by season under agristack_data/crop_registry/.
+
+    Every published run adds one immutable Arrow part per season it touches
+    (season=<name>/part-<ns>-<run_id>.arrow); nothing is rewritten, and for a repeated
+    (AgriStack_FID, Plot_ID, Season) the newest part wins. Season labels are stored in their
+    canonical 'Rabi 2025' form, so 'rabi 2024-25' and 'RABI_2025' share one partition. Queries open only the season
+    partitions they ask for, and per-part F-ID / Plot_ID indexes are built once per process.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def append(self, run_id, crop_registry):
+        """Writes one run's crop rows as new parts; re-appending the same run is a no-op."""
+        frame = crop_registry[CROP_REGISTRY_COLUMNS].copy()
+        for col in CROP_REGISTRY_COLUMNS:
+            frame[col] = frame[col].map(_clean_token)
+        frame['Season'] = frame['Season'].map(season_label)
+        frame['Run_ID'] = run_id
+        frame = frame.drop_duplicates(['AgriStack_FID', 'Plot_ID', 'Season'], keep="last")
+        written = 0
+        with self._lock:
+            for season, rows in frame.groupby('Season', sort=False):
+                partition = self.root / season_partition_name(season)
+                partition.mkdir(exist_ok=True)
+                if any(partition.glob(f"part-*-{run_id}.arrow")):
+                    continue
+                if not (partition / "SEASON").exists():
+                    (partition / "SEASON").write_text(season or "UNSPECIFIED")
+                path = partition / f"part-{time.time_ns():020d}-{run_id}.arrow"
+                table = pa.Table.from_pandas(rows.reset_index(drop=True), preserve_index=False)
+                tmp = path.with_suffix(".tmp")
+                with pa.OSFile(str(tmp), "wb") as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+                tmp.replace(path)
+                written += len(rows)
+        return written
+
+    def discard(self, run_id):
+        """Removes one run's parts again, for a run that could not be published."""
+        with self._lock:
+            for path in self.root.glob(f"season=*/part-*-{run_id}.arrow"):
+                self._indexes.pop(str(path), None)
+                path.unlink()
+
+    def seasons(self):
+        """{season label: [partition dirs]}, oldest season first (unparseable labels last)."""
+        found = {}
+        for p in self.root.glob("season=*"):
+            if (p / "SEASON").exists():
+                found.setdefault(season_label((p / "SEASON").read_text()), []).append(p)
+        return dict(sorted(found.items(), key=lambda kv: (season_sort_key(kv[0]) is None, season_sort_key(kv[0]) or (0, 0), kv[0])))
+
+    def _parts(self, seasons=None):
+        partitions = self.seasons()
+        wanted = partitions if seasons is None else {s: partitions[s] for s in map(season_label, seasons) if s in partitions}
+        return sorted((part for dirs in wanted.values() for p in dirs for part in p.glob("part-*.arrow")), key=lambda part: part.name)
+
+    def _part(self, path):
+        """(table, {column: {value: row positions}}) for one immutable part."""
+        key = str(path)
+        if key not in self._indexes:
+            with self._lock:
+                if key not in self._indexes:
+                    table = pa.ipc.open_file(pa.memory_map(key, "r")).read_all()
+                    keys = table.select(['AgriStack_FID', 'Plot_ID']).to_pandas()
+                    self._indexes[key] = (table, {col: keys.groupby(col).indices for col in keys.columns})
+        return self._indexes[key]
+
+    def _resolve(self, tables):
+        if not tables:
+            return pd.DataFrame(columns=CROP_REGISTRY_COLUMNS + ['Run_ID'])
+        frame = pa.concat_tables(tables).to_pandas()
+        frame['Season'] = frame['Season'].map(season_label)
+        frame = frame.drop_duplicates(['AgriStack_FID', 'Plot_ID', 'Season'], keep="last")
+        order = frame['Season'].map(lambda s: season_sort_key(s) or (9999, 9))
+        return frame.assign(_order=order).sort_values(['_order', 'Plot_ID'], kind="stable").drop(columns='_order').reset_index(drop=True)
+
+    def history(self, fid=None, plot_id=None, seasons=None):
+        """Every season on record for a farmer and/or plot, oldest first."""
+        tables = []
+        for path in self._parts(seasons):
+            table, index = self._part(path)
+            rows = None
+            for col, value in (('AgriStack_FID', fid), ('Plot_ID', plot_id)):
+                if value:
+                    hits = index[col].get(_clean_token(value), np.empty(0, dtype=np.int64))
+                    rows = hits if rows is None else np.intersect1d(rows, hits)
+            if rows is not None and len(rows):
+                tables.append(table.take(pa.array(rows)))
+        return self._resolve(tables)
+
+    def crop_streaks(self, crop, min_seasons=3, seasons=None):
+        """Plots sown with crop in at least min_seasons consecutive calendar seasons.
+
+        Seasons follow the calendar (Rabi, Zaid, Kharif each year), so a season missing from the
+        registry breaks a streak; a Zaid the plot was not sown in does not.
+        """
+        order = [s for s in self.seasons() if season_sort_key(s) is not None]
+        if seasons is not None:
+            picked = set(map(season_label, seasons))
+            order = [s for s in order if s in picked]
+        tables = []
+        for path in self._parts(order):
+            table = self._part(path)[0]
+            mask = pc.equal(pc.utf8_lower(table['Crop_Sown']), str(crop).strip().lower())
+            tables.append(table.filter(mask))
+        sown = self._resolve(tables)
+        if len(sown) == 0:
+            return pd.DataFrame(columns=['AgriStack_FID', 'Plot_ID', 'Village_Code', 'Seasons', 'First_Season', 'Last_Season'])
+        sown['_pos'] = sown['Season'].map(lambda s: season_sort_key(s)[0] * len(CROP_SEASON_ORDER) + season_sort_key(s)[1])
+        sown = sown.sort_values(['AgriStack_FID', 'Plot_ID', '_pos'])
+        # A new run starts wherever the plot changes or a non-Zaid calendar season is skipped
+        gap = sown['_pos'].diff()
+        skipped_zaid = (gap == 2) & ((sown['_pos'] - 1) % len(CROP_SEASON_ORDER) == CROP_SEASON_ORDER['ZAID'])
+        breaks = (sown['Plot_ID'] != sown['Plot_ID'].shift()) | (sown['AgriStack_FID'] != sown['AgriStack_FID'].shift()) | ~((gap == 1) | skipped_zaid)
+        sown['_run'] = breaks.cumsum()
+        runs = sown.groupby('_run').agg(
+            AgriStack_FID=('AgriStack_FID', 'first'), Plot_ID=('Plot_ID', 'first'), Village_Code=('Village_Code', 'last'),
+            Seasons=('Season', 'size'), First_Season=('Season', 'first'), Last_Season=('Season', 'last'))
+        return runs[runs['Seasons'] >= min_seasons].sort_values('Seasons', ascending=False).reset_index(drop=True)
+
+@st.cache_resource
+def get_crop_registry():
+    """Process-wide multi-season Crop Sown Registry."""
+    return CropSeasonRegistry(DATA_DIR / "crop_registry")
+
+# ------------------------------
+# SHARED REGISTRY SNAPSHOTS
+# ------------------------------
+
+SNAPSHOT_TABLES = ('df_final', 'map_data', 'farmer_registry', 'plot_registry', 'crop_registry',
+                   'amber_queue', 'grey_queue', 'red_queue', 'gis_queue', 'super_check_queue', 'gis_pairs',
+                   'rejections', 'cube', 'super_check_strata')
+SNAPSHOT_DISPLAY_TABLES = ('df_final', 'farmer_registry', 'plot_registry', 'crop_registry',
+                           'amber_queue', 'grey_queue', 'red_queue', 'gis_queue', 'super_check_queue')
+MAX_SNAPSHOT_RUNS = 16
+
+def display_frame(df):
+    """Dashboard form of a registry table: schema dates as text, nulls and blanks as "NA", mixed columns as text."""
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            fmt = COLUMN_SCHEMA.get(col, {}).get('format', "%Y-%m-%d %H:%M:%S")
+            df[col] = df[col].dt.strftime(fmt)
+    df = df.fillna("NA").replace("", "NA")
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].astype(str)
+    return df
+
+class RegistrySnapshot:
+    """One published Phase 2 run: immutable Arrow tables memory-mapped from disk, shared by every session.
+
+    Tables are mapped on first use; pandas views, the F-ID lookup and the wall index are
+    derived at most once per process, so concurrent viewers add no per-session copies.
+    """
+
+    def __init__(self, run_id, path):
+        self.run_id = run_id
+        self.path = Path(path)
+        self._tables = {}
+        self._derived = {}
+        self._lock = threading.RLock()  # derived views build on tables (and on other views)
+
+    def has_table(self, name):
+        return (self.path / f"{name}.arrow").exists()
+
+    def table(self, name):
+        """Read-only Arrow table backed by a memory map of <name>.arrow; empty for a table the run predates."""
+        if name not in self._tables:
+            with self._lock:
+                if name not in self._tables:
+                    if self.has_table(name):
+                        source = pa.memory_map(str(self.path / f"{name}.arrow"), "r")
+                        self._tables[name] = pa.ipc.open_file(source).read_all()
+                    else:
+                        self._tables[name] = pa.table({})
+        return self._tables[name]
+
+    def num_rows(self, name):
+        return self.table(name).num_rows
+
+    def columns(self, name):
+        return self.table(name).column_names
+
+    def _derive(self, key, build):
+        if key not in self._derived:
+            with self._lock:
+                if key not in self._derived:
+                    self._derived[key] = build()
+        return self._derived[key]
+
+    def frame(self, name, columns=None):
+        """Shared pandas view of a table (or a column subset); treat as read-only."""
+        cols = tuple(c for c in (columns or self.columns(name)) if c in self.columns(name))
+        return self._derive(('frame', name, cols), lambda: self.table(name).select(list(cols)).to_pandas())
+
+    def csv_bytes(self, name):
+        return self._derive(('csv', name), lambda: self.frame(name).to_csv(index=False).encode('utf-8'))
+
+    @property
+    def fid_lookup(self):
+        return self._derive('fid_lookup', lambda: build_fid_lookup(self.frame('farmer_registry')))
+
+    @property
+    def cube(self):
+        """Channel and eligibility rollups published with the run (rebuilt from df_final for older runs)."""
+        def build():
+            if self.has_table('cube'):
+                return AggregateCube.from_frame(self.frame('cube'))
+            cube = AggregateCube()
+            cube.apply(self.frame('df_final'))
+            return cube
+        return self._derive('cube', build)
+
+    @property
+    def wall_index(self):
+        return self._derive('wall_index', lambda: WallSearchIndex(self.frame('df_final')))
+
+    @property
+    def meta(self):
+        """Run settings recorded at publish time (e.g. overlap_radius_m); {} for older runs."""
+        path = self.path / "meta.json"
+        return self._derive('meta', lambda: json.loads(path.read_text()) if path.exists() else {})
+
+    @property
+    def policy_features(self):
+        """Simulator feature arrays, memory-mapped from .npy files."""
+        def build():
+            return {f.stem: np.load(f, mmap_mode="r") for f in sorted((self.path / "policy_features").glob("*.npy"))}
+        return self._derive('policy_features', build)
+
+class RegistrySnapshotStore:
+    """Process-wide, run-ID versioned registry snapshots under agristack_data/snapshots/<run_id>/."""
+
+    def __init__(self, root, max_runs=MAX_SNAPSHOT_RUNS):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_runs = max_runs
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_run_id(job_id):
+        return f"{job_id}-{datetime.now():%Y%m%d%H%M%S%f}"
+
+    def publish(self, run_id, outputs, policy_features, meta=None):
+        """Writes a finished run's tables once as Arrow IPC files under run_id (from new_run_id)."""
+        staging = self.root / f".{run_id}.tmp"
+        (staging / "policy_features").mkdir(parents=True)
+        (staging / "meta.json").write_text(json.dumps(meta or {}))
+        for name in SNAPSHOT_TABLES:
+            frame = display_frame(outputs[name]) if name in SNAPSHOT_DISPLAY_TABLES else outputs[name]
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            with pa.OSFile(str(staging / f"{name}.arrow"), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        for key, values in policy_features.items():
+            np.save(staging / "policy_features" / f"{key}.npy", values)
+        staging.rename(self.root / run_id)
+        self._prune()
+        return run_id
+
+    def discard(self, run_id):
+        """Removes a published run again, for a run whose publication could not be completed."""
+        with self._lock:
+            self._snapshots.pop(run_id, None)
+            shutil.rmtree(self.root / run_id, ignore_errors=True)
+
+    def _prune(self):
+        runs = sorted((p for p in self.root.iterdir() if p.is_dir() and not p.name.startswith(".")),
+                      key=lambda p: p.stat().st_mtime)
+        with self._lock:
+            for stale in runs[:max(0, len(runs) - self.max_runs)]:
+                self._snapshots.pop(stale.name, None)
+                shutil.rmtree(stale, ignore_errors=True)
+
+    def get(self, run_id):
+        """Shared snapshot for run_id, or None when it was never published or has been pruned.
+
+        Runs published before a table was added to SNAPSHOT_TABLES stay readable; the table is empty.
+        """
+        if not run_id or not re.fullmatch(r"[A-Za-z0-9-]+", str(run_id)):
+            return None
+        with self._lock:
+            snapshot = self._snapshots.get(run_id)
+            if snapshot is None and (self.root / run_id / "df_final.arrow").exists():
+                snapshot = self._snapshots[run_id] = RegistrySnapshot(run_id, self.root / run_id)
+            return snapshot
+
+@st.cache_resource
+def get_snapshot_store():
+    """Process-wide registry snapshot store."""
+    return RegistrySnapshotStore(DATA_DIR / "snapshots")
+
+# ------------------------------
+# REGISTRY CHANGE FEED (CDC)
+# ------------------------------
+
+CDC_KEY = ['AgriStack_FID', 'Plot_ID']
+# Run-local or clock-derived columns: the sample draw, the audit trail, the input file name,
+# and the amnesty/re-verify dates that fall back to "now" when Record_Created is blank
+CDC_IGNORED_COLUMNS = ('Audit_Log', 'Source_File', 'Super_Check_Selected', 'Amnesty_Expiry', 'Reverify_By')
+
+def registry_by_key(df_final):
+    """One row per (AgriStack_FID, Plot_ID): the highest Trust_Score record, as the registries pick it."""
+    ranked = df_final.sort_values('Trust_Score', ascending=False, kind="stable")
+    return ranked.drop_duplicates(CDC_KEY).set_index(CDC_KEY).sort_index()
+
+def compute_registry_delta(current, previous):
+    """Inserted, updated and channel-transitioned rows of current relative to previous (both display form).
+
+    Keys only in previous are not reported: a run covers the files it was given, not the whole registry.
+    """
+    cur = registry_by_key(current)
+    compare = [c for c in cur.columns if c not in CDC_IGNORED_COLUMNS]
+    if previous is None:
+        changes = cur[compare].assign(Change_Type="INSERT", Changed_Columns="", Prev_Governance_Channel="")
+    else:
+        prev = registry_by_key(previous)
+        shared = cur.index.intersection(prev.index)
+        common = [c for c in compare if c in prev.columns]
+        diff = cur.loc[shared, common].astype(str).ne(prev.loc[shared, common].astype(str))
+        changed_cols = diff.dot(pd.Index(common) + ",").str.rstrip(",")
+        updated = shared[diff.any(axis=1).to_numpy()]
+        prev_channel = prev.loc[updated, 'Governance_Channel'].astype(str)
+        transitioned = prev_channel.ne(cur.loc[updated, 'Governance_Channel'].astype(str))
+        inserted = cur.index.difference(prev.index)
+        changes = pd.concat([
+            cur.loc[inserted, compare].assign(Change_Type="INSERT", Changed_Columns="", Prev_Governance_Channel=""),
+            cur.loc[updated, compare].assign(
+                Change_Type=np.where(transitioned, "CHANNEL_TRANSITION", "UPDATE"),
+                Changed_Columns=changed_cols.loc[updated],
+                Prev_Governance_Channel=prev_channel)
+        ])
+    lead = ['Change_Type', 'Changed_Columns', 'Prev_Governance_Channel']
+    return changes[lead + compare].reset_index()
+
+class RegistryChangeLog:
+    """Sequenced change files under agristack_data/cdc/: changes-<seq>-<run_id>.csv.gz plus manifest.jsonl.
+
+    The feed keeps the last published value of every (AgriStack_FID, Plot_ID) in SQLite
+    (published.sqlite3). Each run is diffed against that state for its own keys only, so a
+    run over other villages, or a pruned snapshot, never re-emits rows; a consumer that
+    applies the files in sequence order holds the same registry as the feed.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.manifest = self.root / "manifest.jsonl"
+        self._db = open_index_db(self.root / "published.sqlite3")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS published (
+            fid TEXT NOT NULL, plot_id TEXT NOT NULL, record TEXT NOT NULL,
+            PRIMARY KEY (fid, plot_id)) WITHOUT ROWID""")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def _published(self, cur, compare):
+        """Stored values of cur's keys as a frame of compare columns, or None when none are stored."""
+        keys = list(cur.index)
+        stored = {}
+        for start in range(0, len(keys), 250):
+            chunk = keys[start:start + 250]
+            clause = " OR ".join(["(fid = ? AND plot_id = ?)"] * len(chunk))
+            for fid, plot_id, record in self._db.execute(
+                    f"SELECT fid, plot_id, record FROM published WHERE {clause}", [v for key in chunk for v in key]):
+                stored[(fid, plot_id)] = json.loads(record)
+        if not stored:
+            return None
+        prev = pd.DataFrame.from_dict(stored, orient="index").reindex(columns=compare)
+        prev.index = pd.MultiIndex.from_tuples(prev.index, names=CDC_KEY)
+        # Columns added since a key was last published are not counted as changes
+        prev = prev.fillna(cur.loc[prev.index, compare].astype(str))
+        return prev.reset_index()
+
+    def entries(self):
+        if not self.manifest.exists():
+            return []
+        with open(self.manifest, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def entry(self, run_id):
+        """Manifest entry for a run's change file, or None."""
+        return next((e for e in self.entries() if e['run_id'] == run_id), None)
+
+    def record(self, run_id, snapshot_store):
+        """Diffs run_id against the published state of its keys and writes the next sequenced change file.
+
+        Either the change file, its manifest entry and the state update are all kept, or none is.
+        """
+        with self._lock:
+            entries = self.entries()
+            existing = next((e for e in entries if e['run_id'] == run_id), None)
+            if existing is not None:
+                return existing
+            current = snapshot_store.get(run_id).frame('df_final')
+            cur = registry_by_key(current)
+            compare = [c for c in cur.columns if c not in CDC_IGNORED_COLUMNS]
+            changes = compute_registry_delta(current, self._published(cur, compare))
+            sequence = (entries[-1]['sequence'] + 1) if entries else 1
+            changes.insert(0, 'CDC_Sequence', sequence)
+            name = f"changes-{sequence:08d}-{run_id}.csv.gz"
+            tmp = self.root / f".{name}.tmp"
+            changes.to_csv(tmp, index=False, compression="gzip")
+            tmp.replace(self.root / name)
+            counts = changes['Change_Type'].value_counts()
+            entry = {
+                'sequence': sequence, 'run_id': run_id, 'file': name,
+                'base_sequence': entries[-1]['sequence'] if entries else None,
+                'inserted': int(counts.get("INSERT", 0)), 'updated': int(counts.get("UPDATE", 0)),
+                'channel_transitions': int(counts.get("CHANNEL_TRANSITION", 0)),
+                'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+            published = cur[compare].astype(str)
+            offset = self.manifest.stat().st_size if self.manifest.exists() else 0
+            try:
+                # State and manifest land together: the manifest line is written inside the state transaction
+                with self._db:
+                    self._db.executemany("INSERT OR REPLACE INTO published VALUES (?, ?, ?)",
+                                         ((fid, plot_id, json.dumps(values)) for (fid, plot_id), values
+                                          in zip(published.index, published.to_dict('records'))))
+                    with open(self.manifest, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entry) + "\n")
+            except Exception:
+                if self.manifest.exists():
+                    with open(self.manifest, "r+b") as f:
+                        f.truncate(offset)
+                (self.root / name).unlink(missing_ok=True)
+                raise
+            return entry
+
+    def read_bytes(self, entry):
+        return (self.root / entry['file']).read_bytes()
+
+@st.cache_resource
+def get_change_log():
+    """Process-wide registry change feed."""
+    return RegistryChangeLog(DATA_DIR / "cdc")
+
+# ------------------------------
+# BACKGROUND PHASE 2 JOBS
+# ------------------------------
+
+PHASE2_PARTITION_ROWS = 5000
+MAX_FINISHED_JOBS = 8
+JOB_ACTIVE_STATUSES = ("QUEUED", "RUNNING", "CANCELLING")
+
+def governance_job_id(items, overlap_radius_m, policy=None):
+    """Content-derived job ID, so re-submitting the same inputs resumes from its checkpoints."""
+    digest = hashlib.sha256()
+    for name, data in items:
+        digest.update(name.encode())
+        digest.update(hashlib.sha256(data or b"").digest())
+    digest.update(json.dumps({'radius': overlap_radius_m, 'policy': policy or {}}, sort_keys=True).encode())
+    return f"P2-{digest.hexdigest()[:12].upper()}"
+
+# Serializes publishes across jobs, so one job's rollback cannot undo rows another job wrote
+_PUBLISH_LOCK = threading.Lock()
+
+class GovernanceJob:
+    """Phase 2 run on a worker thread with live progress, cancellation and partition checkpoints.
+
+    Every file is scored in partitions of PHASE2_PARTITION_ROWS rows, INGEST_MAX_WORKERS
+    partitions at a time, and each scored partition is pickled under agristack_data/jobs/<job_id>/,
+    so a run interrupted by a restart picks up from its completed partitions. Checkpoints are
+    removed once the job completes, is cancelled or fails, and the outputs are published to the
+    snapshot store as run_id. Scored partitions are folded, in input order, into the run's
+    channel cube and super-check sample. Publishing writes the snapshot, the run's crop rows,
+    its identity-index rows and its district cube rows, then diffs the run into the registry
+    change feed; see _publish for how a failed publish is undone.
+    """
+
+    def __init__(self, job_id, items, identity_index, snapshot_store, district_cube, crop_registry, fid_index,
+                 change_log, overlap_radius_m=GIS_OVERLAP_RADIUS_M, policy=None):
+        self.job_id = job_id
+        self.items = items
+        self.identity_index = identity_index
+        self.snapshot_store = snapshot_store
+        self.district_cube = district_cube
+        self.crop_registry = crop_registry
+        self.fid_index = fid_index
+        self.change_log = change_log
+        self.overlap_radius_m = overlap_radius_m
+        self.policy = policy
+        self.checkpoint_dir = DATA_DIR / "jobs" / job_id
+        self.status = "QUEUED"
+        self.stage = "Queued"
+        self.rows_total = 0
+        self.rows_done = 0
+        self.rows_resumed = 0
+        self.error = ""
+        self.run_id = None
+        self.started = None
+        self.finished = None
+        self._files = {name: {"File": name, "Status": "QUEUED", "Records": 0, "Rejected": 0, "Message": ""} for name, _ in items}
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"phase2-{job_id}", daemon=True)
+
+    @property
+    def is_active(self):
+        return self.status in JOB_ACTIVE_STATUSES
+
+    def start(self):
+        self.started = time.time()
+        with self._lock:
+            self.status = "RUNNING"
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        with self._lock:
+            if self.status in ("QUEUED", "RUNNING"):
+                self._cancel.set()
+                self.status = "CANCELLING"
+
+    def snapshot(self):
+        """Thread-safe view of progress for the UI."""
+        with self._lock:
+            files = pd.DataFrame(list(self._files.values()))
+        end = self.finished or time.time()
+        scored_now = self.rows_done - self.rows_resumed
+        elapsed = max(end - (self.started or end), 1e-6)
+        return {
+            'job_id': self.job_id, 'status': self.status, 'stage': self.stage,
+            'rows_done': self.rows_done, 'rows_total': self.rows_total, 'rows_resumed': self.rows_resumed,
+            'rows_per_sec': scored_now / elapsed, 'elapsed': elapsed, 'error': self.error, 'files': files
+        }
+
+    def _set_file(self, name, **fields):
+        with self._lock:
+            self._files[name].update(fields)
+
+    def _finish(self, status, stage):
+        if status in ("CANCELLED", "FAILED"):
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+        with self._lock:
+            self.status, self.stage, self.finished = status, stage, time.time()
+
+    def _score_partition(self, file_no, name, start, part):
+        """Scores one partition on a pool worker, or loads its checkpoint; None once the job is cancelled."""
+        if self._cancel.is_set():
+            return None
+        path = self.checkpoint_dir / f"part_{file_no:04d}_{start:09d}.pkl"
+        resumed = path.exists()
+        if resumed:
+            part_final, part_map = pd.read_pickle(path)
+        else:
+            part_final, part_map = execute_verification_protocol(part, self.policy, self.fid_index)
+            part_final['Source_File'] = name
+            tmp = path.with_suffix(".tmp")
+            pd.to_pickle((part_final, part_map), tmp)
+            tmp.replace(path)
+        with self._lock:
+            self.rows_done += len(part)
+            self.rows_resumed += len(part) if resumed else 0
+            self._files[name]["Status"] = "SCORING"
+        return part_final, part_map
+
+    def _publish(self, df_final, outputs):
+        """Publishes a scored run and returns its run_id; if any step fails, the ones before it are undone.
+
+        The change feed entry is written last and is the commit point, so a run that does not
+        complete leaves no snapshot, crop rows, identity rows or cube rows behind.
+        """
+        run_id = self.snapshot_store.new_run_id(self.job_id)
+        undo = []
+        with _PUBLISH_LOCK:
+            try:
+                self.crop_registry.append(run_id, outputs['crop_registry'])
+                undo.append(lambda: self.crop_registry.discard(run_id))
+                self.snapshot_store.publish(run_id, outputs, extract_policy_features(outputs['df_final']),
+                                            {'overlap_radius_m': self.overlap_radius_m})
+                undo.append(lambda: self.snapshot_store.discard(run_id))
+                identity_token = self.identity_index.upsert(identity_index_records(outputs['df_final']))
+                undo.append(lambda: self.identity_index.restore(identity_token))
+                cube_token = self.district_cube.apply(df_final)
+                undo.append(lambda: self.district_cube.revert(cube_token))
+                self.change_log.record(run_id, self.snapshot_store)
+            except Exception:
+                for step in reversed(undo):
+                    try:
+                        step()
+                    except Exception:
+                        # Keep undoing the rest; the job reports the error that stopped the publish
+                        pass
+                raise
+        return run_id
+
+    def _run(self):
+        try:
+            self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+            self.stage = "Loading files"
+            partitions, rejections = [], []
+            for file_no, (name, data) in enumerate(self.items):
+                try:
+                    if data is None:
+                        raise ValueError("Unreadable archive")
+                    df_input, rejected = load_data_validated(io.BytesIO(data))
+                except Exception as exc:
+                    self._set_file(name, Status="FAILED", Message=f"{type(exc).__name__}: {exc}")
+                    continue
+                self._set_file(name, Status="LOADED", Records=len(df_input), Rejected=len(rejected))
+                if len(rejected) > 0:
+                    rejections.append(rejected.assign(File=name))
+                for start in range(0, len(df_input), PHASE2_PARTITION_ROWS):
+                    partitions.append((file_no, name, start, df_input.iloc[start:start + PHASE2_PARTITION_ROWS]))
+                self.rows_total += len(df_input)
+
+            self.stage = "Scoring"
+            # One F-ID batch for the whole run first, so the order in which concurrent partitions
+            # finish cannot change which new identity claims a contested base ID
+            self.fid_index.assign([r for *_, part in partitions for r in fid_input_records(part)])
+            with ThreadPoolExecutor(max_workers=INGEST_MAX_WORKERS) as pool:
+                futures = [pool.submit(self._score_partition, *partition) for partition in partitions]
+                try:
+                    scored = [fut.result() for fut in futures]
+                except Exception:
+                    for fut in futures:
+                        fut.cancel()
+                    raise
+            if self._cancel.is_set():
+                self._finish("CANCELLED", "Cancelled")
+                return
+            run_cube = AggregateCube()
+            sampler = SuperCheckSampler()
+            for part_final, _ in scored:
+                run_cube.apply(part_final)
+                sampler.offer(part_final, sampler.rows_seen)
+            for name in self._files:
+                if self._files[name]["Status"] == "SCORING":
+                    self._set_file(name, Status="DONE")
+            if not scored:
+                raise ValueError("No file could be scored.")
+
+            self.stage = "Building registries"
+            df_final = pd.concat([p[0] for p in scored], ignore_index=True)
+            df_final['Super_Check_Selected'] = sampler.mask(len(df_final))
+            map_data = pd.concat([p[1] for p in scored], ignore_index=True)
+            outputs = build_governance_outputs(df_final, map_data, self.identity_index, self.overlap_radius_m)
+            outputs['rejections'] = (pd.concat(rejections, ignore_index=True)[['File', 'Row', 'Columns', 'Detail']]
+                                     if rejections else pd.DataFrame(columns=['File', 'Row', 'Columns', 'Detail']))
+            outputs['cube'] = run_cube.to_frame()
+            outputs['super_check_strata'] = sampler.summary()
+
+            self.stage = "Publishing snapshot"
+            self.run_id = self._publish(df_final, outputs)
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+            self._finish("DONE", "Complete")
+        except Exception as exc:
+            self.error = f"{type(exc).__name__}: {exc}"
+            self._finish("FAILED", "Failed")
+
+class JobRegistry:
+    """Process-wide registry of Phase 2 jobs; a page refresh re-attaches to its job by ID."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def submit(self, job):
+        """Starts job unless a job with the same ID is still running, in which case that one is returned."""
+        with self._lock:
+            existing = self._jobs.get(job.job_id)
+            if existing is not None and existing.is_active:
+                return existing
+            self._jobs[job.job_id] = job.start()
+            finished = sorted((j for j in self._jobs.values() if not j.is_active), key=lambda j: j.finished or 0)
+            for stale in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                self._jobs.pop(stale.job_id, None)
+            return job
+
+@st.cache_resource
+def get_job_registry():
+    """Process-wide Phase 2 job registry."""
+    return JobRegistry()
+
 # ============================================================
-# MODULE 3: STREAMLIT DASHBOARD
+# MODULE 4: STREAMLIT DASHBOARD
 # ============================================================
 
 def _img_b64(path):
@@ -583,6 +2702,64 @@ with st.sidebar:
     st.subheader("System Controls")
     offline_mode = st.checkbox("Offline Mode (Queue Sync)", value=True)
     st.caption("Offline mode queues sync events for low-connectivity regions.")
+    overlap_radius_m = st.number_input("Plot overlap radius (m)", min_value=1, max_value=500, value=GIS_OVERLAP_RADIUS_M)
+    st.caption("Different Khasras captured within this radius are sent to GIS analyst review.")
+
+def photo_thumbnail_viewer(df, id_col, sha_col, key):
+    """Record picker that fetches a stored photo thumbnail only when a record is selected."""
+    if sha_col not in df.columns:
+        return
+    shas = df[sha_col].map(_clean_token)
+    with_photo = df.loc[shas != "", id_col].astype(str)
+    if len(with_photo) == 0:
+        st.caption("No stored photos in these records.")
+        return
+    pick = st.selectbox(f"View photo ({len(with_photo)} stored)", ["—"] + with_photo.tolist(), key=key)
+    if pick != "—":
+        sha = shas.loc[with_photo.index[with_photo.tolist().index(pick)]]
+        thumb = load_photo_thumbnail(sha)
+        if thumb:
+            st.image(thumb, caption=f"{pick} · sha256 {sha[:12]}…")
+        else:
+            st.caption(f"{pick}: photo {sha[:12]}… has no preview on this server.")
+
+def attach_registry_run(run_id):
+    """Points this session at a published registry snapshot; the session itself keeps only the run ID."""
+    st.session_state['registry_run_id'] = run_id
+    st.query_params['run'] = run_id
+    st.session_state.pop('policy_results', None)
+
+def current_snapshot():
+    """The shared snapshot this session is viewing (from session state or a ?run= link), or None."""
+    snapshot = get_snapshot_store().get(st.session_state.get('registry_run_id') or st.query_params.get('run'))
+    if snapshot is not None:
+        st.session_state['registry_run_id'] = snapshot.run_id
+    return snapshot
+
+def _phase2_job_panel(job_id):
+    job = get_job_registry().get(job_id)
+    if job is None:
+        return
+    snap = job.snapshot()
+    total = max(snap['rows_total'], 1)
+    st.progress(min(snap['rows_done'] / total, 1.0), text=f"Job {snap['job_id']} · {snap['status']} · {snap['stage']}")
+    resumed = f" · {snap['rows_resumed']} resumed from checkpoint" if snap['rows_resumed'] else ""
+    st.caption(f"{snap['rows_done']} / {snap['rows_total']} rows scored · {snap['rows_per_sec']:,.0f} rows/s · {snap['elapsed']:.1f}s elapsed{resumed}")
+    if len(snap['files']) > 0:
+        failed = int((snap['files']['Status'] == "FAILED").sum())
+        if failed:
+            st.warning(f"{failed} file(s) failed and were skipped; the rest were merged.")
+        st.dataframe(snap['files'], use_container_width=True)
+    if snap['status'] == "FAILED":
+        st.error(f"Phase 2 job failed: {snap['error']}")
+    elif snap['status'] == "CANCELLED":
+        st.warning("Phase 2 job cancelled. Execute again to start a fresh run.")
+    if job.is_active:
+        if st.button("Cancel Job", key="phase2_cancel_btn"):
+            job.cancel()
+    elif st.session_state.pop('phase2_polling', None) == job_id:
+        # Job finished while this panel was polling: rerun the whole app to publish results
+        st.rerun()
 
 tab1, tab0, tab2, tab3, tab4 = st.tabs([
     "Phase 1: Digitization Workbench",
@@ -608,10 +2785,8 @@ with tab0:
         st.session_state['vdv_lat'] = None
     if 'vdv_lon' not in st.session_state:
         st.session_state['vdv_lon'] = None
-    if 'area_kanal_auto' not in st.session_state:
-        st.session_state['area_kanal_auto'] = ""
-    if 'area_marla_auto' not in st.session_state:
-        st.session_state['area_marla_auto'] = ""
+    if 'vdv_boundary' not in st.session_state:
+        st.session_state['vdv_boundary'] = ""
     if 'aadhaar_verified' not in st.session_state:
         st.session_state['aadhaar_verified'] = False
     if 'aadhaar_number' not in st.session_state:
@@ -702,7 +2877,8 @@ with tab0:
             else:
                 timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
                 aadhaar_masked = st.session_state['aadhaar_number'][-4:].rjust(12, "X") if st.session_state['aadhaar_number'] else ""
-                farmer_id = generate_strong_fid(owner_name, lgd_code, vdv_device_id, parentage_name)
+                farmer_id = get_fid_index().assign([(owner_name, lgd_code, vdv_device_id, parentage_name)])[0][0]
+                farmer_photo_name, farmer_photo_kb, farmer_photo_sha = store_captured_photo(farmer_photo)
                 farmer_record = {
                     "AgriStack_FID": farmer_id,
                     "Owner_Name": owner_name,
@@ -724,8 +2900,9 @@ with tab0:
                     "Absentee_Reason": absentee_reason,
                     "Revenue_Demand_Mutation": revenue_demand,
                     "Role": role,
-                    "Farmer_Photo_Name": farmer_photo.name if farmer_photo else "NA",
-                    "Farmer_Photo_Size_KB": int(farmer_photo.size/1024) if farmer_photo else "NA",
+                    "Farmer_Photo_Name": farmer_photo_name,
+                    "Farmer_Photo_Size_KB": farmer_photo_kb,
+                    "Farmer_Photo_SHA256": farmer_photo_sha,
                     "Record_Created": timestamp.split(" ")[0],
                     "Sync_Status": "QUEUED_OFFLINE" if offline_mode else "SYNCED"
                 }
@@ -743,8 +2920,9 @@ with tab0:
             khasra_no = st.text_input("Khasra No", value=prefill_row.get('Khasra_No','') if prefill_row else "")
             land_type = st.text_input("Land Type", value=prefill_row.get('Land_Type','') if prefill_row else "")
         with c8:
-            area_kanal = st.text_input("Area (Kanal)", value=st.session_state['area_kanal_auto'] or (prefill_row.get('Area_Kanal','') if prefill_row else ""))
-            area_marla = st.text_input("Area (Marla)", value=st.session_state['area_marla_auto'] or (prefill_row.get('Area_Marla','') if prefill_row else ""))
+            # Declared (Jamabandi) area; the boundary walk is recorded separately and checked against it
+            area_kanal = st.text_input("Declared Area (Kanal)", value=prefill_row.get('Area_Kanal','') if prefill_row else "")
+            area_marla = st.text_input("Declared Area (Marla)", value=prefill_row.get('Area_Marla','') if prefill_row else "")
         with c9:
             season = st.text_input("Season", value="Rabi 2025")
             crop_sown = st.text_input("Crop Sown")
@@ -758,11 +2936,27 @@ with tab0:
                 sim_lat, sim_lon = 33.7782, 76.5762
             st.session_state['vdv_lat'] = round(sim_lat + random.uniform(-0.0003, 0.0003), 6)
             st.session_state['vdv_lon'] = round(sim_lon + random.uniform(-0.0003, 0.0003), 6)
-            rand_area = random.uniform(1.5, 12.0)
-            kanal = int(rand_area)
-            marla = int((rand_area - kanal) * 20)
-            st.session_state['area_kanal_auto'] = str(kanal)
-            st.session_state['area_marla_auto'] = str(marla)
+            st.session_state['vdv_boundary'] = format_boundary(simulate_boundary_walk(khasra_no))
+
+        boundary_text = st.text_area(
+            "Boundary GPS Walk (lat,lon per vertex; separated by ';' or new lines)",
+            value=st.session_state['vdv_boundary']
+        )
+        boundary_points = parse_boundary(boundary_text)
+        if len(boundary_points) >= 3:
+            area_check = compute_area_deviation(pd.DataFrame([{
+                'Boundary_GPS': format_boundary(boundary_points), 'Area_Kanal': area_kanal, 'Area_Marla': area_marla
+            }])).iloc[0]
+            measured_sqm = area_check['Measured_Area_SqM']
+            kanal, marla = sqm_to_kanal_marla(measured_sqm)
+            deviation = area_check['Area_Deviation_Pct']
+            versus = f" · {deviation:+.1f}% vs declared" if pd.notna(deviation) else " · no declared area to compare"
+            st.caption(f"Measured area: {measured_sqm:,.0f} m² = {kanal} Kanal {marla} Marla ({len(boundary_points)} vertices){versus}")
+            if pd.notna(deviation) and abs(deviation) > AREA_DEVIATION_TOLERANCE_PCT:
+                st.warning(f"Measured area deviates more than {AREA_DEVIATION_TOLERANCE_PCT:g}% from the Jamabandi area.")
+            st.session_state['vdv_boundary'] = boundary_text
+        elif boundary_text.strip():
+            st.warning("A boundary walk needs at least 3 valid GPS vertices.")
 
         vdv_lat = st.number_input("VDV Latitude", value=st.session_state['vdv_lat'] or 0.0, format="%.6f")
         vdv_lon = st.number_input("VDV Longitude", value=st.session_state['vdv_lon'] or 0.0, format="%.6f")
@@ -782,13 +2976,13 @@ with tab0:
                 "VDV Latitude": vdv_lat,
                 "VDV Longitude": vdv_lon
             }
-            missing_plot = [k for k, v in required_plot.items() if str(v).strip() == "" or str(v) == "0.0"]
+            # GPS number inputs default to 0.0 until captured; text fields are missing when blank
+            missing_plot = [k for k, v in required_plot.items() if (v == 0.0 if isinstance(v, float) else str(v).strip() == "")]
             if missing_plot:
                 st.error(f"Missing required fields: {', '.join(missing_plot)}")
             else:
                 timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-                photo_name = vdv_photo.name if vdv_photo else ""
-                photo_size_kb = int(vdv_photo.size/1024) if vdv_photo else ""
+                photo_name, photo_size_kb, photo_sha = store_captured_photo(vdv_photo)
                 plot_id = generate_pid(khasra_no, prefill_row.get('LGD_Code','LGD-0001') if prefill_row else "LGD-0001")
                 plot_record = {
                     "AgriStack_FID": selected_farmer,
@@ -804,7 +2998,9 @@ with tab0:
                     "VDV_Lon": vdv_lon,
                     "VDV_Timestamp": timestamp,
                     "Plot_Photo_Name": photo_name,
-                    "Plot_Photo_Size_KB": photo_size_kb
+                    "Plot_Photo_Size_KB": photo_size_kb,
+                    "Plot_Photo_SHA256": photo_sha,
+                    "Boundary_GPS": format_boundary(boundary_points) if len(boundary_points) >= 3 else ""
                 }
                 st.session_state['vdv_plots'].append(plot_record)
                 st.success("Plot added.")
@@ -815,8 +3011,10 @@ with tab0:
         df_plots = pd.DataFrame(st.session_state['vdv_plots'])
         st.markdown("Farmers")
         st.dataframe(df_farmers, use_container_width=True)
+        photo_thumbnail_viewer(df_farmers, 'AgriStack_FID', 'Farmer_Photo_SHA256', key="vdv_farmer_photo")
         st.markdown("Plots")
         st.dataframe(df_plots, use_container_width=True)
+        photo_thumbnail_viewer(df_plots, 'Plot_ID', 'Plot_Photo_SHA256', key="vdv_plot_photo")
 
         if len(df_farmers) > 0 and len(df_plots) > 0:
             df_mobile = df_plots.merge(df_farmers, on='AgriStack_FID', how='left')
@@ -851,34 +3049,46 @@ with tab1:
     st.markdown("Upload a scanned Jamabandi PDF (Shikasta Urdu) to verify the AI's extraction.")
     st.markdown("<div class='callout'>Output from this phase is the corrected OCR dataset used for VDV field verification.</div>", unsafe_allow_html=True)
 
-    # CHANGE 1: Accept PDF files
+    # CHANGE 1: Accept PDF files (many at once, or ZIP archives of PDFs)
     uploaded_raw = st.file_uploader(
-        "Upload Scanned Jamabandi PDF",
-        type=['pdf'],
+        "Upload Scanned Jamabandi PDFs (or ZIP archives)",
+        type=['pdf', 'zip'],
+        accept_multiple_files=True,
         key="raw_up_unique"
     )
 
     # 1. Load Data & Initialize Session
     if uploaded_raw:
-        # Run OCR simulation
-        df_ocr, status = run_ocr_pipeline(uploaded_raw)
-        
-        # Normalize columns
-        for col in USER_COLUMNS:
-            if col not in df_ocr.columns:
-                df_ocr[col] = ""
-
-        # Store data in session
-        st.session_state['ocr_data'] = df_ocr
-        st.session_state['ocr_status'] = status
-        
-        # Initialize WORKING copy
-        if 'vdv_work_data' not in st.session_state:
+        batch_key = tuple((f.name, f.size) for f in uploaded_raw)
+        if st.session_state.get('ocr_batch_key') != batch_key:
+            items = expand_uploads(uploaded_raw, (".pdf",))
+            progress_slot = st.empty()
+            results, progress = run_file_batch(items, ocr_file_worker, on_progress=progress_slot.dataframe)
+            progress_slot.empty()
+            frames = [results[name][0] for name, _ in items if name in results]
+            df_ocr = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=USER_COLUMNS + ['Source_File'])
+
+            # Normalize columns
+            for col in USER_COLUMNS:
+                if col not in df_ocr.columns:
+                    df_ocr[col] = ""
+
+            # Store data in session
+            st.session_state['ocr_batch_key'] = batch_key
+            st.session_state['ocr_data'] = df_ocr
+            st.session_state['ocr_sources'] = {name: data for name, data in items if name in results}
+            st.session_state['ocr_progress'] = progress
+            st.session_state['ocr_status'] = f"Extracted {len(df_ocr)} records from {len(results)} of {len(items)} file(s)"
+
+            # Initialize WORKING copy for the new batch
             st.session_state['vdv_work_data'] = df_ocr.copy()
+            st.session_state.pop('ocr_editor_right', None)
 
     # 2. Display Split Screen
     if uploaded_raw and 'ocr_data' in st.session_state:
         st.success(f"AI Extraction Status: {st.session_state['ocr_status']}")
+        with st.expander("Per-file OCR status", expanded=bool((st.session_state['ocr_progress']['Status'] == 'FAILED').any())):
+            st.dataframe(st.session_state['ocr_progress'], use_container_width=True)
 
         col_left, col_right = st.columns([1, 1], gap="large")
 
@@ -886,8 +3096,11 @@ with tab1:
         with col_left:
             st.subheader("Source Document (PDF)")
             st.info("Reference: Original Shikasta Urdu Script")
-            uploaded_raw.seek(0)
-            pdf_bytes = uploaded_raw.read()
+            sources = st.session_state['ocr_sources']
+            pdf_bytes = b""
+            if sources:
+                source_name = st.selectbox("Document", list(sources)) if len(sources) > 1 else next(iter(sources))
+                pdf_bytes = sources[source_name]
             try:
                 doc = fitz.open(stream=pdf_bytes, filetype="pdf")
                 page_count = doc.page_count
@@ -924,150 +3137,266 @@ with tab1:
 # TAB 2: GOVERNANCE
 # -----------------------
 with tab2:
-    uploaded_verified = st.file_uploader("Upload Transliterated CSV", type=['csv'], key="ver_upload_tab2")
+    uploaded_verified = st.file_uploader(
+        "Upload Transliterated CSVs (or ZIP archives)",
+        type=['csv', 'zip'],
+        accept_multiple_files=True,
+        key="ver_upload_tab2"
+    )
     if uploaded_verified:
-        df_input = load_data_robust(uploaded_verified)
-        st.success(f"Successfully loaded {len(df_input)} records.")
+        verified_items = expand_uploads(uploaded_verified, (".csv",))
+        st.success(f"Loaded {len(verified_items)} file(s) for scoring.")
         with st.expander("Preview Data"):
-            st.dataframe(df_input)
+            preview_name = st.selectbox("File", [name for name, _ in verified_items], key="ver_preview_file")
+            preview_data = dict(verified_items)[preview_name] if verified_items else None
+            try:
+                preview_df, preview_rejected = load_data_validated(io.BytesIO(preview_data))
+                st.dataframe(preview_df)
+                if len(preview_rejected) > 0:
+                    st.caption(f"{len(preview_rejected)} record(s) have values rejected by the schema; they are nulled before scoring.")
+                    st.dataframe(preview_rejected, use_container_width=True)
+            except Exception as exc:
+                st.warning(f"Preview unavailable: {exc}")
 
         if st.button("Execute Governance Protocol", key="governance_btn"):
-            # Assume execute_verification_protocol is implemented
-            df_final, map_data = execute_verification_protocol(df_input)
-
-            # Registries
-            df_ranked = df_final.sort_values(by=['Trust_Score'], ascending=False)
-            farmer_registry = df_ranked.groupby('AgriStack_FID', as_index=False).first()
-            plot_registry = df_ranked.groupby('Plot_ID', as_index=False).first()
-            crop_registry = df_final[['AgriStack_FID','Plot_ID','Season','Crop_Sown','Village_Code','LGD_Code']].copy()
-
-            # Dedupe and conflicts
-            entity_counts = df_final.groupby('Entity_Key').size().reset_index(name='Entity_Count')
-            df_final = df_final.merge(entity_counts, on='Entity_Key', how='left')
-            df_final['Cross_District_Dedupe_Flag'] = df_final.groupby('Entity_Key')['District'].transform('nunique') > 1
-            df_final['Conflict_Flag'] = df_final['Entity_Count'] > 1
-
-            # GIS overlap detection
-            plot_counts = df_final.groupby('Plot_ID').size().reset_index(name='Plot_Count')
-            df_final = df_final.merge(plot_counts, on='Plot_ID', how='left')
-            df_final['GIS_Overlap_Flag'] = df_final['Plot_Count'] > 1
-
-            # Queue snapshots
-            amber_queue = df_final[df_final['Workflow_Queue'] == 'BLOCK_TECH_UNIT']
-            grey_queue = df_final[df_final['Workflow_Queue'] == 'MUTATION_FOLLOWUP']
-            red_queue = df_final[df_final['Workflow_Queue'] == 'AUDIT_QUEUE']
-            gis_queue = df_final[df_final['GIS_Overlap_Flag'] == True]
-
-            df_display = df_final.fillna("NA").replace("", "NA")
-            st.session_state['df_final'] = df_display
-            st.session_state['map_data'] = map_data
-            st.session_state['farmer_registry'] = farmer_registry.fillna("NA").replace("", "NA")
-            st.session_state['plot_registry'] = plot_registry.fillna("NA").replace("", "NA")
-            st.session_state['crop_registry'] = crop_registry.fillna("NA").replace("", "NA")
-            st.session_state['amber_queue'] = amber_queue.fillna("NA").replace("", "NA")
-            st.session_state['grey_queue'] = grey_queue.fillna("NA").replace("", "NA")
-            st.session_state['red_queue'] = red_queue.fillna("NA").replace("", "NA")
-            st.session_state['gis_queue'] = gis_queue.fillna("NA").replace("", "NA")
-
-            st.subheader("GIS Plot Verification")
-            map_df = map_data.copy()
-            map_df['color'] = map_df['status'].apply(lambda s: [0, 180, 0, 140] if s == 'PASS' else [200, 0, 0, 160])
-            if len(map_df) > 0:
-                view_state = pdk.ViewState(
-                    latitude=map_df['lat'].mean(),
-                    longitude=map_df['lon'].mean(),
-                    zoom=10
-                )
-                layer = pdk.Layer(
-                    "ScatterplotLayer",
-                    data=map_df,
-                    get_position='[lon, lat]',
-                    get_fill_color='color',
-                    get_radius=60,
-                    pickable=True
-                )
-                st.pydeck_chart(pdk.Deck(layers=[layer], initial_view_state=view_state, tooltip={"text": "{status}"}))
-            else:
-                st.info("No GIS points available.")
-
-            st.subheader("Governance Audit Results")
-            c1, c2, c3, c4 = st.columns(4)
-            c1.markdown(f"<div class='card'><div class='subtle'>Green</div><div style='font-size:26px;font-weight:700'>{len(df_final[df_final['Governance_Channel']=='GREEN'])}</div></div>", unsafe_allow_html=True)
-            c2.markdown(f"<div class='card'><div class='subtle'>Grey</div><div style='font-size:26px;font-weight:700'>{len(df_final[df_final['Governance_Channel']=='GREY'])}</div></div>", unsafe_allow_html=True)
-            c3.markdown(f"<div class='card'><div class='subtle'>Amber</div><div style='font-size:26px;font-weight:700'>{len(df_final[df_final['Governance_Channel']=='AMBER'])}</div></div>", unsafe_allow_html=True)
-            c4.markdown(f"<div class='card'><div class='subtle'>Red</div><div style='font-size:26px;font-weight:700'>{len(df_final[df_final['Governance_Channel']=='RED'])}</div></div>", unsafe_allow_html=True)
-
-            # --- Color-coded final table
-            def color_coding(row):
-                val = row['Governance_Channel']
-                if val=='GREEN': return ['background-color: #d4edda']*len(row)
-                elif val=='GREY': return ['background-color: #e2e3e5']*len(row)
-                elif val=='AMBER': return ['background-color: #fff3cd']*len(row)
-                else: return ['background-color: #f8d7da']*len(row)
-
-            disp_cols = [
-                'AgriStack_FID', 'Plot_ID', 'Owner_Name', 'Land_Type', 'GIS_Status',
-                'Trust_Score', 'Governance_Channel', 'Action_Taken', 'CRC_Issued',
-                'KCC_Eligible', 'PM_KISAN_Eligible', 'PMFBY_Eligible', 'Workflow_Queue',
-                'Amnesty_Expiry', 'Reverify_By', 'Super_Check_Selected', 'Provisional_Label'
-            ]
-            final_cols = [c for c in disp_cols if c in df_final.columns]
-            df_display = df_final.fillna("NA").replace("", "NA")
-            st.dataframe(df_display[final_cols].style.apply(color_coding, axis=1))
+            job_id = governance_job_id(verified_items, overlap_radius_m)
+            job = get_job_registry().submit(
+                GovernanceJob(job_id, verified_items, get_identity_index(), get_snapshot_store(), get_district_cube(), get_crop_registry(),
+                              get_fid_index(), get_change_log(), overlap_radius_m))
+            st.session_state['phase2_job_id'] = job.job_id
+            st.query_params['phase2_job'] = job.job_id
+
+    job_id = st.session_state.get('phase2_job_id') or st.query_params.get('phase2_job')
+    job = get_job_registry().get(job_id) if job_id else None
+    if job is not None:
+        st.session_state['phase2_job_id'] = job.job_id
+        st.subheader("Phase 2 Job")
+        if job.is_active:
+            st.session_state['phase2_polling'] = job.job_id
+            st.fragment(run_every=1.0)(_phase2_job_panel)(job.job_id)
+        else:
+            st.session_state.pop('phase2_polling', None)
+            _phase2_job_panel(job.job_id)
+        if job.status == "DONE" and st.session_state.get('phase2_published_job') != job.run_id:
+            attach_registry_run(job.run_id)
+            st.session_state['phase2_published_job'] = job.run_id
+
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        st.caption(f"Registry snapshot {snapshot.run_id}")
+        if snapshot.num_rows('rejections') > 0:
+            with st.expander(f"Schema rejections: {snapshot.num_rows('rejections')} record(s) had invalid values nulled at load"):
+                st.dataframe(snapshot.table('rejections'), use_container_width=True)
+
+        st.subheader("GIS Plot Verification")
+        map_df = snapshot.frame('map_data').copy()
+        map_df['color'] = map_df['status'].apply(lambda s: [0, 180, 0, 140] if s == 'PASS' else [200, 0, 0, 160])
+        if len(map_df) > 0:
+            view_state = pdk.ViewState(
+                latitude=map_df['lat'].mean(),
+                longitude=map_df['lon'].mean(),
+                zoom=10
+            )
+            layer = pdk.Layer(
+                "ScatterplotLayer",
+                data=map_df,
+                get_position='[lon, lat]',
+                get_fill_color='color',
+                get_radius=60,
+                pickable=True
+            )
+            st.pydeck_chart(pdk.Deck(layers=[layer], initial_view_state=view_state, tooltip={"text": "{status}"}))
+        else:
+            st.info("No GIS points available.")
+
+        st.subheader("Governance Audit Results")
+        channel_counts = snapshot.cube.channel_counts()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.markdown(f"<div class='card'><div class='subtle'>Green</div><div style='font-size:26px;font-weight:700'>{channel_counts.get('GREEN', 0)}</div></div>", unsafe_allow_html=True)
+        c2.markdown(f"<div class='card'><div class='subtle'>Grey</div><div style='font-size:26px;font-weight:700'>{channel_counts.get('GREY', 0)}</div></div>", unsafe_allow_html=True)
+        c3.markdown(f"<div class='card'><div class='subtle'>Amber</div><div style='font-size:26px;font-weight:700'>{channel_counts.get('AMBER', 0)}</div></div>", unsafe_allow_html=True)
+        c4.markdown(f"<div class='card'><div class='subtle'>Red</div><div style='font-size:26px;font-weight:700'>{channel_counts.get('RED', 0)}</div></div>", unsafe_allow_html=True)
+
+        # --- Color-coded final table
+        def color_coding(row):
+            val = row['Governance_Channel']
+            if val=='GREEN': return ['background-color: #d4edda']*len(row)
+            elif val=='GREY': return ['background-color: #e2e3e5']*len(row)
+            elif val=='AMBER': return ['background-color: #fff3cd']*len(row)
+            else: return ['background-color: #f8d7da']*len(row)
+
+        disp_cols = [
+            'AgriStack_FID', 'Plot_ID', 'Owner_Name', 'Land_Type', 'GIS_Status',
+            'Area_Deviation_Pct', 'Trust_Score', 'Governance_Channel', 'Action_Taken', 'CRC_Issued',
+            'KCC_Eligible', 'PM_KISAN_Eligible', 'PMFBY_Eligible', 'Workflow_Queue',
+            'Amnesty_Expiry', 'Reverify_By', 'Super_Check_Selected', 'Provisional_Label'
+        ]
+        df_display = snapshot.frame('df_final', disp_cols)
+        st.dataframe(df_display.style.apply(color_coding, axis=1))
+        st.download_button(
+            "Export Final Registry",
+            snapshot.csv_bytes('df_final'),
+            "AgriStack_Final_Registry.csv",
+            "text/csv"
+        )
+        change_entry = get_change_log().entry(snapshot.run_id)
+        if change_entry is not None:
+            base = (f"the registry as published through #{change_entry['base_sequence']}" if change_entry.get('base_sequence')
+                    else change_entry.get('base_run_id') or "an empty registry")
+            st.caption(f"Change file #{change_entry['sequence']} against {base}: {change_entry['inserted']} inserted, "
+                       f"{change_entry['updated']} updated, {change_entry['channel_transitions']} channel transition(s).")
             st.download_button(
-                "Export Final Registry",
-                df_display.to_csv(index=False).encode('utf-8'),
-                "AgriStack_Final_Registry.csv",
-                "text/csv"
+                f"Export Changes (#{change_entry['sequence']})",
+                get_change_log().read_bytes(change_entry),
+                change_entry['file'],
+                "application/gzip"
             )
 
+    if snapshot is not None:
+        with st.expander("Policy What-If Simulator"):
+            st.caption("Re-evaluates the last run under alternative thresholds without re-scoring any record.")
+            sweep_params = st.multiselect(
+                "Parameters to sweep",
+                list(POLICY_LABELS),
+                default=['green_cutoff'],
+                format_func=POLICY_LABELS.get
+            )
+            sweep_values = {}
+            for key in sweep_params:
+                raw = st.text_input(
+                    f"{POLICY_LABELS[key]} (default {DEFAULT_POLICY[key]})",
+                    value=", ".join(str(v) for v in POLICY_SWEEP_DEFAULTS[key]),
+                    key=f"sweep_{key}"
+                )
+                values = [parse_float(v.strip()) for v in raw.split(",") if v.strip()]
+                sweep_values[key] = [v for v in values if v is not None] or [DEFAULT_POLICY[key]]
+            if min(sweep_values.get('fuzzy_threshold', [IDENTITY_EXACT_FLOOR])) < IDENTITY_EXACT_FLOOR:
+                st.caption(f"Identity scores below {IDENTITY_EXACT_FLOOR}% are not measured and count as 0, so fuzzy thresholds under {IDENTITY_EXACT_FLOOR} are approximate.")
+            scenarios = build_policy_scenarios(sweep_values)
+            st.caption(f"{len(scenarios)} scenario(s) (max {MAX_POLICY_SCENARIOS})")
+            if st.button("Run Simulation", key="policy_sim_btn"):
+                t0 = time.time()
+                st.session_state['policy_results'] = simulate_policies(snapshot.policy_features, scenarios)
+                st.session_state['policy_elapsed'] = time.time() - t0
+            if 'policy_results' in st.session_state:
+                summary, transitions = st.session_state['policy_results']
+                st.success(f"Evaluated {len(summary)} scenario(s) in {st.session_state['policy_elapsed']:.2f}s")
+                st.dataframe(summary, use_container_width=True)
+                pick = st.selectbox("Channel transitions (last run -> scenario)", summary['Scenario'].tolist())
+                st.dataframe(transitions[summary['Scenario'].tolist().index(pick)], use_container_width=True)
+
 # -----------------------
 # TAB 3: REGISTRIES & QUEUES
 # -----------------------
 with tab3:
     st.markdown("<div class='section-title'>Registries & Governance Queues</div>", unsafe_allow_html=True)
-    if 'df_final' not in st.session_state:
+    snapshot = current_snapshot()
+    if snapshot is None:
         st.info("Run Phase 2 to populate registries and queues.")
     else:
+        st.subheader("Channel & Eligibility Dashboard")
+        cube_scope = st.radio("Scope", ["This run", "All runs (latest score per record)"], horizontal=True, key="cube_scope")
+        cube = snapshot.cube if cube_scope == "This run" else get_district_cube()
+        geo = []
+        for level, col in zip(CUBE_GEO_LEVELS, st.columns(len(CUBE_GEO_LEVELS))):
+            options = cube.children(tuple(geo))
+            pick = col.selectbox(level.replace("_", " "), ["All"] + options, key=f"cube_{level}") if options else "All"
+            if pick == "All":
+                break
+            geo.append(pick)
+        summary = cube.channel_summary(tuple(geo))
+        summary['Declared_Area'] = [f"{k} Kanal {m} Marla" for k, m in map(sqm_to_kanal_marla, summary['Declared_Area_SqM'])]
+        st.dataframe(summary, use_container_width=True)
+        if len(geo) < len(CUBE_GEO_LEVELS):
+            st.dataframe(cube.breakdown(tuple(geo)), use_container_width=True, hide_index=True)
+
         st.subheader("Farmer Registry (F-ID)")
-        st.dataframe(st.session_state['farmer_registry'], use_container_width=True)
+        st.dataframe(snapshot.table('farmer_registry'), use_container_width=True)
+        photo_thumbnail_viewer(snapshot.frame('farmer_registry', ['AgriStack_FID', 'Farmer_Photo_SHA256']), 'AgriStack_FID', 'Farmer_Photo_SHA256', key="registry_farmer_photo")
 
         st.subheader("Plot Registry (P-ID)")
-        st.dataframe(st.session_state['plot_registry'], use_container_width=True)
+        st.dataframe(snapshot.table('plot_registry'), use_container_width=True)
+        photo_thumbnail_viewer(snapshot.frame('plot_registry', ['Plot_ID', 'Plot_Photo_SHA256']), 'Plot_ID', 'Plot_Photo_SHA256', key="registry_plot_photo")
 
         st.subheader("Crop Sown Registry (Seasonal Link)")
-        st.dataframe(st.session_state['crop_registry'], use_container_width=True)
+        st.dataframe(snapshot.table('crop_registry'), use_container_width=True)
+        with st.expander("Crop history across seasons"):
+            crop_store = get_crop_registry()
+            all_seasons = list(crop_store.seasons())
+            st.caption(f"{len(all_seasons)} season partition(s) on record.")
+            picked_seasons = st.multiselect("Seasons", all_seasons, default=all_seasons, key="crop_hist_seasons")
+            h1, h2 = st.columns(2)
+            hist_fid = h1.text_input("F-ID", key="crop_hist_fid").strip()
+            hist_plot = h2.text_input("Plot ID", key="crop_hist_plot").strip()
+            if hist_fid or hist_plot:
+                st.dataframe(crop_store.history(hist_fid, hist_plot, picked_seasons), use_container_width=True, hide_index=True)
+            s1, s2 = st.columns(2)
+            streak_crop = s1.text_input("Crop sown in consecutive seasons", key="crop_streak_crop").strip()
+            streak_len = s2.number_input("Minimum seasons", min_value=2, max_value=40, value=3, key="crop_streak_len")
+            if streak_crop:
+                streaks = crop_store.crop_streaks(streak_crop, int(streak_len), picked_seasons)
+                st.caption(f"{len(streaks)} plot(s) sown with {streak_crop} for {int(streak_len)}+ consecutive seasons.")
+                st.dataframe(streaks, use_container_width=True, hide_index=True)
 
         st.subheader("Dedupe and Cross-District Flags")
-        dedupe_view = st.session_state['df_final'][['AgriStack_FID','Owner_Name','Entity_Key','Entity_Count','Conflict_Flag','Cross_District_Dedupe_Flag','District','Tehsil','Village_Code']]
+        dedupe_cols = ['AgriStack_FID','Owner_Name','Entity_Key','Entity_Count','Conflict_Flag','Cross_District_Dedupe_Flag','FID_Collision_Resolved','Indexed_Districts','Indexed_FIDs','District','Tehsil','Village_Code']
+        dedupe_view = snapshot.table('df_final').select([c for c in dedupe_cols if c in snapshot.columns('df_final')])
         st.dataframe(dedupe_view, use_container_width=True)
+        if 'FID_Collision_Resolved' in snapshot.columns('df_final'):
+            widened = int(snapshot.frame('df_final', ['FID_Collision_Resolved'])['FID_Collision_Resolved'].astype(str).eq("True").sum())
+            if widened:
+                st.caption(f"{widened} record(s) received a widened F-ID because their short ID already belonged to a different farmer.")
 
         st.subheader("Governance Queues")
         st.markdown("Amber → Block Technical Unit")
-        st.dataframe(st.session_state['amber_queue'], use_container_width=True)
+        st.dataframe(snapshot.table('amber_queue'), use_container_width=True)
         st.markdown("Grey → Mutation Follow-up")
-        st.dataframe(st.session_state['grey_queue'], use_container_width=True)
+        st.dataframe(snapshot.table('grey_queue'), use_container_width=True)
         st.markdown("Red → Audit Queue")
-        st.dataframe(st.session_state['red_queue'], use_container_width=True)
+        st.dataframe(snapshot.table('red_queue'), use_container_width=True)
 
         st.subheader("GIS Analyst Review Queue")
-        st.dataframe(st.session_state['gis_queue'], use_container_width=True)
+        st.dataframe(snapshot.table('gis_queue'), use_container_width=True)
+        if snapshot.num_rows('gis_pairs') > 0:
+            run_radius = snapshot.meta.get('overlap_radius_m')
+            within = f"within {run_radius} m" if run_radius is not None else "within the run's overlap radius"
+            st.markdown(f"Proximity pairs: distinct Khasras captured {within} of each other")
+            st.dataframe(snapshot.table('gis_pairs'), use_container_width=True)
+
+        st.subheader("Super-Check Field Audit Sample")
+        st.caption(f"Stratified by channel × VDV device × village: up to {SUPER_CHECK_PER_STRATUM} record(s) per stratum, "
+                   f"{SUPER_CHECK_PER_STRATUM * SUPER_CHECK_CHANNEL_WEIGHT['AMBER']} for AMBER and {SUPER_CHECK_PER_STRATUM * SUPER_CHECK_CHANNEL_WEIGHT['RED']} for RED, "
+                   f"with proxy verifications weighted {SUPER_CHECK_PROXY_WEIGHT:g}×. Seed {SUPER_CHECK_SEED}.")
+        st.dataframe(snapshot.table('super_check_queue'), use_container_width=True)
+        with st.expander("Strata"):
+            st.dataframe(snapshot.table('super_check_strata'), use_container_width=True)
 
 # -----------------------
 # TAB 4: PANCHAYAT VALIDATION
 # -----------------------
 with tab4:
     st.markdown("<div class='section-title'>Panchayat Validation</div>", unsafe_allow_html=True)
-    if 'df_final' not in st.session_state:
+    snapshot = current_snapshot()
+    if snapshot is None:
         st.info("Run Phase 2 to open the public verification wall.")
     else:
         st.subheader("Public Verification Wall")
         wall_cols = ['AgriStack_FID','Owner_Name','Village_Code','Khasra_No','Governance_Channel','Trust_Score','Provisional_Label']
-        wall_cols = [c for c in wall_cols if c in st.session_state['df_final'].columns]
-        st.dataframe(st.session_state['df_final'][wall_cols], use_container_width=True)
+        wall_cols = [c for c in wall_cols if c in snapshot.columns('df_final')]
+        wall_query = st.text_input("Find your record (name, Khasra No, F-ID or Village Code)", key="wall_query")
+        if wall_query.strip():
+            t0 = time.time()
+            positions, scores = snapshot.wall_index.search(wall_query)
+            wall_view = snapshot.table('df_final').select(wall_cols).take(positions).to_pandas()
+            wall_view.insert(0, 'Match_Score', np.round(scores, 2))
+            st.caption(f"{len(wall_view)} match(es) in {(time.time() - t0) * 1000:.1f} ms")
+            st.dataframe(wall_view, use_container_width=True)
+        else:
+            st.caption(f"Showing the first {WALL_RESULT_LIMIT} of {snapshot.num_rows('df_final')} records. Search to find a specific record.")
+            st.dataframe(snapshot.table('df_final').select(wall_cols).slice(0, WALL_RESULT_LIMIT), use_container_width=True)
 
-        if 'grievances' not in st.session_state:
-            st.session_state['grievances'] = []
+        grievance_store = get_grievance_store()
+        fid_lookup = snapshot.fid_lookup
 
         st.subheader("Grievance Intake")
         with st.form("grievance_form"):
@@ -1078,17 +3407,27 @@ with tab4:
             g_priority = st.selectbox("Priority", ["Low","Medium","High"])
             submit_grievance = st.form_submit_button("Submit Grievance")
         if submit_grievance:
-            st.session_state['grievances'].append({
-                "AgriStack_FID": g_fid,
-                "Name": g_name,
-                "Contact": g_contact,
-                "Priority": g_priority,
-                "Details": g_reason,
-                "Status": "PANCHAYAT_REVIEW",
-                "Submitted": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
-            st.success("Grievance submitted.")
+            fid = g_fid.strip().upper()
+            if fid not in fid_lookup:
+                st.error(f"F-ID {g_fid or '(blank)'} not found in the current Farmer Registry.")
+            else:
+                record = grievance_store.submit(fid, g_name, g_contact, g_priority, g_reason, fid_lookup[fid])
+                st.success(f"Grievance {record['Grievance_ID']} submitted ({record['Governance_Channel']} channel).")
 
-        if len(st.session_state['grievances']) > 0:
+        if grievance_store.total_count > 0:
             st.subheader("Grievance Queue")
-            st.dataframe(pd.DataFrame(st.session_state['grievances']), use_container_width=True)
+            st.caption(f"{grievance_store.open_count} open of {grievance_store.total_count} total · ordered by priority, then age")
+            n_pages = max(1, math.ceil(grievance_store.open_count / GRIEVANCE_PAGE_SIZE))
+            page_no = st.number_input("Page", min_value=1, max_value=n_pages, value=1, key="grievance_page") - 1
+            page_df = grievance_store.page(page_no)
+            if len(page_df) > 0:
+                st.dataframe(page_df, use_container_width=True)
+                r1, r2 = st.columns([3, 1])
+                with r1:
+                    resolve_id = st.selectbox("Grievance", page_df['Grievance_ID'].tolist(), key="grievance_resolve_id")
+                with r2:
+                    if st.button("Mark Resolved", key="grievance_resolve_btn"):
+                        grievance_store.resolve(resolve_id)
+                        st.rerun()
+            else:
+                st.info("No open grievances.")
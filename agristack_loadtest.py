@@ -0,0 +1,483 @@
+"""
+AgriStack load test against a live server.
+
+Starts `streamlit run` on a temporary copy of agristack_app_v9.py and drives N concurrent
+simulated browser sessions over Streamlit's websocket protocol, each on its own connection, so
+their reruns contend inside one server exactly as real tabs do. Reports rerun latency
+percentiles (request sent to script finished), server memory per session and throughput. Run
+before each release:
+
+    python agristack_loadtest.py --sessions 20
+    python agristack_loadtest.py --sessions 40 --vdv-share 0.7 --max-p95-ms 1500 --json load.json
+
+Journeys:
+- VDV: Aadhaar verify -> farmer registration (with photo) -> GPS capture -> plot registration
+- Officer: Phase 1 PDF upload -> workbench edit -> Phase 2 execution -> grievance submission
+
+Each session behaves like the browser frontend: it resends every widget value it has entered
+on each rerun, sends button clicks once, and uploads files through the server's upload URLs.
+Widgets are found by label (the data editor by its key) in the elements the last run rendered.
+The server runs with XSRF protection off so the client needs no cookie handshake.
+
+The run writes its identity index, snapshots and photos under the temporary copy instead of
+into the real agristack_data/.
+"""
+
+import argparse
+import io
+import json
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import requests
+from PIL import Image
+from websockets.sync.client import connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+ROOT = Path(__file__).resolve().parent
+APP_FILE = ROOT / "agristack_app_v9.py"
+SAMPLE_CSV = ROOT / "Transliterated and VDV Verified.csv"
+SAMPLE_PDF = ROOT / "Jamabandi_Sample.pdf"
+RUN_TIMEOUT_S = 180
+SERVER_START_TIMEOUT_S = 60
+PHASE2_POLL_S = 0.5
+PHASE2_MAX_WAIT_S = 600
+
+# ------------------------------
+# LIVE SERVER
+# ------------------------------
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(app_path, port, log_path):
+    """`streamlit run` on app_path in a child process; returns it once /_stcore/health answers."""
+    cmd = [sys.executable, "-m", "streamlit", "run", str(app_path),
+           "--server.headless", "true", "--server.address", "127.0.0.1", "--server.port", str(port),
+           "--server.enableXsrfProtection", "false", "--server.fileWatcherType", "none",
+           "--server.runOnSave", "false", "--browser.gatherUsageStats", "false"]
+    log = open(log_path, "wb")
+    proc = subprocess.Popen(cmd, cwd=app_path.parent, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + SERVER_START_TIMEOUT_S
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"streamlit exited with code {proc.returncode}; see {log_path}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/_stcore/health", timeout=2).ok:
+                return proc
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.25)
+    stop_server(proc)
+    raise RuntimeError(f"streamlit did not answer on port {port} within {SERVER_START_TIMEOUT_S}s")
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+def rss_bytes(pid):
+    """Resident set size of a process from /proc (Linux); 0 where /proc is not available."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+# ------------------------------
+# WEBSOCKET SESSION
+# ------------------------------
+
+class SessionClient:
+    """One simulated browser tab: a websocket to the live server plus a log of timed reruns."""
+
+    def __init__(self, port, session_no, journey, log, lock):
+        self.base_url = f"http://127.0.0.1:{port}"
+        self._stack = ExitStack()
+        self.ws = self._stack.enter_context(connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"],
+                                                    max_size=None, open_timeout=RUN_TIMEOUT_S))
+        self.session_no = session_no
+        self.journey = journey
+        self.session_id = ""
+        self.query_string = ""
+        self.widgets = {}
+        self.values = {}
+        self.alerts, self.texts, self.exceptions = [], [], []
+        self._requests = 0
+        self._log = log
+        self._lock = lock
+
+    def close(self):
+        self._stack.close()
+
+    def _receive(self):
+        msg = ForwardMsg()
+        msg.ParseFromString(self.ws.recv(timeout=RUN_TIMEOUT_S))
+        return msg
+
+    def _collect(self, element):
+        kind = element.WhichOneof("type")
+        proto = getattr(element, kind)
+        if kind == "alert":
+            self.alerts.append(proto.body)
+        elif kind == "markdown":
+            self.texts.append(proto.body)
+        elif kind == "exception":
+            self.exceptions.append(f"{proto.type}: {proto.message}")
+        elif getattr(proto, "id", ""):
+            # Labelled widgets are found by label; the data editor has none, so by the key ending its ID
+            self.widgets[getattr(proto, "label", "") or proto.id.rsplit("-", 1)[-1]] = (kind, proto)
+
+    def run(self, step, trigger=None):
+        """One timed rerun with every entered widget value (and one button click); raises if the script raised."""
+        msg = BackMsg()
+        msg.rerun_script.query_string = self.query_string
+        states = msg.rerun_script.widget_states.widgets
+        for label, value in self.values.items():
+            if label in self.widgets:
+                state = states.add()
+                state.CopyFrom(value)
+                state.id = self.widgets[label][1].id
+        if trigger is not None:
+            state = states.add()
+            state.id = self.widgets[trigger][1].id
+            state.trigger_value = True
+        t0 = time.perf_counter()
+        self.ws.send(msg.SerializeToString())
+        while True:
+            fwd = self._receive()
+            kind = fwd.WhichOneof("type")
+            if kind == "new_session":
+                self.session_id = fwd.new_session.initialize.session_id
+                self.widgets, self.alerts, self.texts, self.exceptions = {}, [], [], []
+            elif kind == "page_info_changed":
+                self.query_string = fwd.page_info_changed.query_string
+            elif kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                self._collect(fwd.delta.new_element)
+            elif kind == "script_finished" and fwd.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+        elapsed = time.perf_counter() - t0
+        with self._lock:
+            self._log.append({'Session': self.session_no, 'Journey': self.journey, 'Step': step, 'Latency_ms': elapsed * 1000})
+        if self.exceptions:
+            raise RuntimeError(f"{step}: {self.exceptions[0]}")
+
+    def label(self, label=None, contains=None):
+        for name in self.widgets:
+            if name == label or (contains is not None and contains in name):
+                return name
+        raise LookupError(f"No widget matching {label or contains!r}")
+
+    def set(self, label, value):
+        """Enters a value the way the frontend would send it: text, a checkbox, or data editor edits."""
+        label = self.label(label)
+        kind, _ = self.widgets[label]
+        state = WidgetState()
+        if kind in ("text_input", "text_area"):
+            state.string_value = value
+        elif kind == "checkbox":
+            state.bool_value = value
+        elif kind == "dataframe":
+            state.string_value = json.dumps(value)
+        else:
+            raise TypeError(f"{label}: setting a {kind} is not supported")
+        self.values[label] = state
+
+    def upload(self, contains, files):
+        """Uploads (name, bytes, mime) files to a file uploader through its upload URLs; sent with the next rerun."""
+        label = self.label(contains=contains)
+        self._requests += 1
+        msg = BackMsg()
+        msg.file_urls_request.request_id = str(self._requests)
+        msg.file_urls_request.session_id = self.session_id
+        msg.file_urls_request.file_names.extend(name for name, _, _ in files)
+        self.ws.send(msg.SerializeToString())
+        while True:
+            fwd = self._receive()
+            if fwd.WhichOneof("type") == "file_urls_response" and fwd.file_urls_response.response_id == str(self._requests):
+                break
+        if fwd.file_urls_response.error_msg:
+            raise RuntimeError(f"upload {label}: {fwd.file_urls_response.error_msg}")
+        state = WidgetState()
+        for (name, data, mime), urls in zip(files, fwd.file_urls_response.file_urls):
+            reply = requests.put(self.base_url + urls.upload_url, files={"file": (name, data, mime)}, timeout=RUN_TIMEOUT_S)
+            reply.raise_for_status()
+            info = state.file_uploader_state_value.uploaded_file_info.add()
+            info.name, info.size, info.file_id = name, len(data), urls.file_id
+            info.file_urls.CopyFrom(urls)
+        self.values[label] = state
+
+    def click(self, label, step):
+        self.run(step, trigger=self.label(label))
+
+    def expect_alert(self, text, step):
+        if not any(text in body for body in self.alerts):
+            raise RuntimeError(f"{step}: no {text!r} message; alerts were {self.alerts}")
+
+# ------------------------------
+# JOURNEYS
+# ------------------------------
+
+def _jpeg(seed):
+    rng = np.random.default_rng(seed)
+    img = Image.fromarray(rng.integers(0, 255, (480, 640, 3), dtype=np.uint8))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+def vdv_journey(s, session_no):
+    """Aadhaar verify -> farmer registration -> GPS capture -> plot registration."""
+    s.run("open_app")
+    s.set("Aadhaar Number", f"{session_no:012d}")
+    s.set("OTP (dummy: 123456)", "123456")
+    s.set("Consent to Aadhaar verification", True)
+    s.click("Verify Aadhaar", "aadhaar_verify")
+    s.expect_alert("Aadhaar verified.", "aadhaar_verify")
+
+    fields = {
+        "VDV Collector Name": f"Collector {session_no}",
+        "VDV Domicile Village Code": f"DOM{session_no:03d}",
+        "Owner Name": f"Gyan Chand {session_no}",
+        "Parentage Name": "Dheru",
+        "Khevat No": str(100 + session_no),
+        "Khata No": str(10 + session_no),
+        "Cultivator Name": "Khudkasht",
+        "VDV Verified Name": f"Gyan Chand {session_no}",
+        "Revenue Demand / Mutation": "Mutation 505",
+    }
+    for label, value in fields.items():
+        s.set(label, value)
+    s.upload("Farmer Photo", [(f"farmer_{session_no}.jpg", _jpeg(session_no), "image/jpeg")])
+    s.run("farmer_photo_upload")
+    s.click("Register Farmer", "farmer_registration")
+    s.expect_alert("Farmer registered.", "farmer_registration")
+
+    plot_fields = {
+        "Khasra No": str(400 + session_no),
+        "Land Type": "Nahri",
+        "Remarks / Kaifiyat": "Clean",
+        "Crop Sown": "Wheat",
+        "Declared Area (Kanal)": "4",
+        "Declared Area (Marla)": "10",
+    }
+    for label, value in plot_fields.items():
+        s.set(label, value)
+    s.run("plot_form_edit")
+    s.click("Capture GPS (Simulated)", "gps_capture")
+    s.click("Add Plot", "plot_registration")
+    s.expect_alert("Plot added.", "plot_registration")
+
+def officer_journey(s, session_no, csv_bytes, pdf_bytes, data_dir):
+    """Phase 1 upload and edit -> Phase 2 execution -> grievance submission."""
+    s.run("open_app")
+    s.upload("Jamabandi", [(f"jamabandi_{session_no}.pdf", pdf_bytes, "application/pdf")])
+    s.run("phase1_upload")
+    if "ocr_editor_right" not in s.widgets:
+        raise RuntimeError("phase1_upload: the workbench was not filled")
+    owner = f"Edited Owner {session_no}"
+    s.set("ocr_editor_right", {"edited_rows": {"0": {"Owner_Name": owner}}, "added_rows": [], "deleted_rows": []})
+    s.run("phase1_edit")
+
+    s.upload("Transliterated", [(f"village_{session_no}.csv", csv_bytes, "text/csv")])
+    s.run("phase2_upload")
+    # The VDV prefill list renders above the workbench, so it shows the edit one rerun later
+    prefill = s.widgets[s.label("Select record for prefill")][1]
+    if not prefill.options or not prefill.options[0].startswith(owner):
+        raise RuntimeError("phase1_edit: the workbench edit was not applied")
+    s.click("Execute Governance Protocol", "phase2_submit")
+    deadline = time.time() + PHASE2_MAX_WAIT_S
+    run_id = None
+    while run_id is None:
+        failed = [body for body in s.alerts if body.startswith("Phase 2 job failed")]
+        if failed:
+            raise RuntimeError(f"phase2_poll: {failed[0]}")
+        if time.time() > deadline:
+            raise RuntimeError("phase2_poll: job did not publish in time")
+        time.sleep(PHASE2_POLL_S)
+        s.run("phase2_poll")
+        run_id = next((m.group(1) for m in map(re.compile(r"Registry snapshot (\S+)").search, s.texts) if m), None)
+
+    registry = pa.ipc.open_file(pa.memory_map(str(data_dir / "snapshots" / run_id / "farmer_registry.arrow"))).read_all()
+    fid = registry['AgriStack_FID'][0].as_py()
+    s.set("AgriStack F-ID", fid)
+    s.set("Complainant Name", f"Officer {session_no}")
+    s.set("Grievance Details", "Channel disputed at Gram Sabha")
+    s.click("Submit Grievance", "grievance_submit")
+    s.expect_alert("submitted", "grievance_submit")
+
+# ------------------------------
+# LOAD RUN
+# ------------------------------
+
+def village_csv(session_no, rows, shared):
+    """Sample village CSV grown to `rows` rows; each officer gets distinct content unless shared."""
+    df = pd.read_csv(SAMPLE_CSV, dtype=str, keep_default_na=False)
+    df = pd.concat([df] * max(1, -(-rows // len(df))), ignore_index=True).head(rows)
+    df['VDV_Device_ID'] = "TAB-SHARED" if shared else f"TAB-{session_no:03d}"
+    return df.to_csv(index=False).encode()
+
+def run_load_test(args):
+    work_dir = Path(tempfile.mkdtemp(prefix="agristack_load_"))
+    app_path = work_dir / APP_FILE.name
+    shutil.copy(APP_FILE, app_path)
+    pdf_bytes = SAMPLE_PDF.read_bytes()
+    rng = random.Random(args.seed)
+    journeys = ["vdv" if rng.random() < args.vdv_share else "officer" for _ in range(args.sessions)]
+
+    port = free_port()
+    server = start_server(app_path, port, work_dir / "server.log")
+    log, lock = [], threading.Lock()
+    failures = []
+    try:
+        # Warm-up session: imports, caches and the first script compile are not charged to the test
+        warm = SessionClient(port, -1, "warmup", [], lock)
+        warm.run("warmup")
+        warm.close()
+        rss_start = rss_bytes(server.pid)
+
+        def session(i):
+            time.sleep(rng.uniform(0, args.ramp_seconds))
+            s = None
+            try:
+                s = SessionClient(port, i, journeys[i], log, lock)
+                if journeys[i] == "vdv":
+                    vdv_journey(s, i)
+                else:
+                    officer_journey(s, i, village_csv(i, args.rows, args.shared_phase2), pdf_bytes, work_dir / "agristack_data")
+            except Exception as exc:
+                with lock:
+                    failures.append({'Session': i, 'Journey': journeys[i], 'Error': f"{type(exc).__name__}: {exc}"})
+            finally:
+                finished.release()
+                # Connections stay open until every session is done, as open tabs would
+                done.wait()
+                if s is not None:
+                    s.close()
+
+        finished, done = threading.Semaphore(0), threading.Event()
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=session, args=(i,), name=f"session-{i}") for i in range(args.sessions)]
+        for t in threads:
+            t.start()
+        for _ in threads:
+            finished.acquire()
+        wall = time.perf_counter() - t0
+        rss_end = rss_bytes(server.pid)
+        done.set()
+        for t in threads:
+            t.join()
+    finally:
+        stop_server(server)
+
+    latencies = pd.DataFrame(log, columns=['Session', 'Journey', 'Step', 'Latency_ms'])
+    if not args.keep_data:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        'latencies': latencies,
+        'failures': pd.DataFrame(failures, columns=['Session', 'Journey', 'Error']),
+        'wall_seconds': wall,
+        'sessions': args.sessions,
+        'journeys': {j: journeys.count(j) for j in ("vdv", "officer")},
+        'rss_start': rss_start,
+        'rss_end': rss_end,
+        'work_dir': str(work_dir) if args.keep_data else ""
+    }
+
+# ------------------------------
+# REPORT
+# ------------------------------
+
+LATENCY_COLUMNS = ['Reruns', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+
+def latency_table(latencies):
+    """p50/p95/p99/max rerun latency (ms) per step plus an ALL row."""
+    def summarize(ms):
+        return pd.Series([len(ms), np.percentile(ms, 50), np.percentile(ms, 95), np.percentile(ms, 99), ms.max()],
+                         index=LATENCY_COLUMNS)
+    if len(latencies) == 0:
+        return pd.DataFrame(columns=LATENCY_COLUMNS)
+    steps = list(dict.fromkeys(latencies['Step']))
+    table = pd.DataFrame([summarize(latencies.loc[latencies['Step'] == step, 'Latency_ms']) for step in steps], index=steps)
+    table.loc['ALL'] = summarize(latencies['Latency_ms'])
+    table['Reruns'] = table['Reruns'].astype(int)
+    return table.round(1)
+
+def summarize_run(result):
+    lat = result['latencies']
+    n = max(result['sessions'], 1)
+    completed = result['sessions'] - len(result['failures'])
+    return {
+        'sessions': result['sessions'],
+        'journeys': result['journeys'],
+        'completed_sessions': completed,
+        'failed_sessions': len(result['failures']),
+        'wall_seconds': round(result['wall_seconds'], 2),
+        'reruns': len(lat),
+        'reruns_per_second': round(len(lat) / max(result['wall_seconds'], 1e-9), 2),
+        'sessions_per_minute': round(completed * 60 / max(result['wall_seconds'], 1e-9), 2),
+        'server_rss_start_mb': round(result['rss_start'] / 2**20, 1),
+        'server_rss_end_mb': round(result['rss_end'] / 2**20, 1),
+        'server_rss_per_session_mb': round((result['rss_end'] - result['rss_start']) / n / 2**20, 2),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the AgriStack Streamlit app.")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent simulated sessions")
+    parser.add_argument("--vdv-share", type=float, default=0.5, help="share of sessions running the VDV journey")
+    parser.add_argument("--rows", type=int, default=900, help="rows per Phase 2 village CSV")
+    parser.add_argument("--shared-phase2", action="store_true", help="all officers submit the same village file")
+    parser.add_argument("--ramp-seconds", type=float, default=2.0, help="spread session start times over this window")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="fail (exit 1) when the overall rerun-latency p95 exceeds this")
+    parser.add_argument("--json", dest="json_path", default=None, help="also write the report as JSON")
+    parser.add_argument("--keep-data", action="store_true", help="keep the temporary app data directory")
+    args = parser.parse_args(argv)
+
+    result = run_load_test(args)
+    table = latency_table(result['latencies'])
+    summary = summarize_run(result)
+
+    pd.set_option("display.width", 160)
+    print("\nRerun latency by step (request sent -> script finished, measured at the client)")
+    print(table.to_string())
+    print("\nSummary")
+    for key, value in summary.items():
+        print(f"  {key:24s} {value}")
+    if len(result['failures']) > 0:
+        print("\nFailures")
+        print(result['failures'].to_string(index=False))
+    if result['work_dir']:
+        print(f"\nApp data kept in {result['work_dir']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({'summary': summary, 'latency': table.reset_index().to_dict('records'),
+                       'failures': result['failures'].to_dict('records')}, f, indent=2)
+
+    slow = args.max_p95_ms is not None and len(table) > 0 and table.loc['ALL', 'p95_ms'] > args.max_p95_ms
+    return 1 if len(result['failures']) > 0 or slow else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,391 @@
+"""
+Focused checks for the AgriStack registry indexes, change feed, engine and stores.
+
+The app is a single Streamlit script, so it is loaded once in bare mode with runpy and its
+functions are exercised directly. Run with:
+
+    python -m pytest -q test_agristack_app_v9.py
+"""
+
+import io
+import logging
+import runpy
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parent
+SAMPLE_CSV = ROOT / "Transliterated and VDV Verified.csv"
+
+@pytest.fixture(scope="module")
+def app():
+    logging.disable(logging.CRITICAL)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return runpy.run_path(str(ROOT / "agristack_app_v9.py"))
+
+@pytest.fixture(scope="module")
+def sample(app):
+    return app['load_data_robust'](io.BytesIO(SAMPLE_CSV.read_bytes()))
+
+# ------------------------------
+# INGEST SCHEMA
+# ------------------------------
+
+def test_coerce_to_schema_nulls_rejections_and_report(app):
+    raw = pd.DataFrame({
+        'Owner_Name': ["Ram Lal", "NA", " - "],
+        'VDV_Lat': ["33.5", "n/a", "95"],
+        'Area_Kanal': ["4", "abc", "-1"],
+        'Record_Created': ["2024-05-01", "", "01/05/2024"],
+        'Proxy_Verification': ["Yes", "null", "maybe"],
+    })
+    typed, report = app['coerce_to_schema'](raw)
+
+    assert typed['Owner_Name'].tolist() == ["Ram Lal", "", ""]
+    assert typed['VDV_Lat'].iloc[0] == 33.5 and typed['VDV_Lat'].iloc[1:].isna().all()
+    assert typed['Proxy_Verification'].iloc[0] is True and typed['Proxy_Verification'].iloc[1:].isna().all()
+    assert typed['Record_Created'].iloc[0] == pd.Timestamp("2024-05-01")
+    # Null tokens are not rejections; unparseable and out-of-range values are, one report row per record
+    assert report['Row'].tolist() == [2, 3]
+    assert report.loc[0, 'Columns'] == "Area_Kanal"
+    assert report.loc[1, 'Columns'] == "Area_Kanal, VDV_Lat, Proxy_Verification, Record_Created"
+    assert "VDV_Lat=95 (out of range)" in report.loc[1, 'Detail']
+    assert "Area_Kanal=-1 (out of range)" in report.loc[1, 'Detail']
+
+    # A coerced frame, or a row slice of one, passes straight through
+    again, again_report = app['coerce_to_schema'](typed.iloc[1:])
+    assert again.equals(typed.iloc[1:]) and again_report.empty
+
+# ------------------------------
+# PERSISTENT INDEXES
+# ------------------------------
+
+def test_identity_index_replaces_district_on_upsert(app, tmp_path):
+    index = app['IdentityIndex'](tmp_path)
+    first = [("ram|lal", "Srinagar", "L1", "F1"), ("ram|lal", "Jammu", "L2", "F2")]
+    assert index.lookup(first)["ram|lal"]['districts'] == ["Srinagar", "Jammu"]
+    index.upsert(first)
+
+    # F2 re-uploaded from Srinagar: Jammu is retracted rather than kept forever
+    again = [("ram|lal", "Srinagar", "L1", "F2")]
+    entry = index.lookup(again)["ram|lal"]
+    assert entry['districts'] == ["Srinagar"]
+    assert entry['fids'] == ["F1", "F2"]
+    token = index.upsert(again)
+    assert app['IdentityIndex'](tmp_path).lookup(again)["ram|lal"] == entry
+
+    # A restored write reads as it did before it
+    index.restore(token)
+    assert index.lookup([("ram|lal", "Srinagar", "L1", "F1")])["ram|lal"]['districts'] == ["Srinagar", "Jammu"]
+
+def test_identity_person_key_needs_parentage(app):
+    assert app['identity_person_key']("ram|lal|LGD1|TAB-1") == "ram|lal"
+    assert app['identity_person_key']("ram||LGD1|TAB-1") == ""
+
+def test_fid_index_resolves_collisions_stably(app, tmp_path):
+    records = [(f"FARMER {i}", "LGD1", "TAB-1", f"PARENT {i}") for i in range(20000)]
+    bases = [app['generate_strong_fid'](*r) for r in records]
+    index = app['FidCollisionIndex'](tmp_path / "a")
+    fids, collided = index.assign(records)
+
+    assert len(set(fids)) == len(records)
+    assert sum(collided) == len(bases) - len(set(bases)) > 0
+    assert all(fid.startswith(base) for fid, base in zip(fids, bases))
+    # Known identities keep their F-ID after a reopen, whatever the row order
+    again, _ = app['FidCollisionIndex'](tmp_path / "a").assign(records[::-1])
+    assert again[::-1] == fids
+    fresh, _ = app['FidCollisionIndex'](tmp_path / "b").assign(records[::-1])
+    assert fresh[::-1] == fids
+
+def test_district_cube_reopens_from_stored_rows(app, sample, tmp_path):
+    scored, _ = app['execute_verification_protocol'](sample)
+    cube = app['AggregateCube'](keyed=True, path=tmp_path / "cube.sqlite3")
+    cube.apply(scored)
+    rescored = scored.head(10).assign(Governance_Channel="RED")
+    cube.apply(rescored)
+
+    reopened = app['AggregateCube'](keyed=True, path=tmp_path / "cube.sqlite3")
+    assert reopened.channel_summary().equals(cube.channel_summary())
+    assert sum(reopened.channel_counts().values()) == len(scored)
+    assert reopened.children() == cube.children()
+
+def test_district_cube_keys_seasons_by_canonical_label(app, sample, tmp_path):
+    scored, _ = app['execute_verification_protocol'](sample)
+    cube = app['AggregateCube'](keyed=True, path=tmp_path / "cube.sqlite3")
+    cube.apply(scored.assign(Season="Rabi 2025"))
+    cube.apply(scored.assign(Season="RABI_2025"))
+    cube.apply(scored.head(5).assign(Season="rabi 2024-25", Governance_Channel="RED"))
+
+    assert sum(cube.channel_counts().values()) == len(scored)
+    reopened = app['AggregateCube'](keyed=True, path=tmp_path / "cube.sqlite3")
+    assert reopened.channel_summary().equals(cube.channel_summary())
+
+# ------------------------------
+# GRIEVANCES
+# ------------------------------
+
+def test_grievance_pages_follow_priority_and_survive_reopen(app, tmp_path):
+    store = app['GrievanceStore'](tmp_path)
+    entry = {'Owner_Name': "Ram Lal", 'Village_Code': "V1", 'Governance_Channel': "RED", 'Audit_Trace': ""}
+    priorities = ["Low", "High", "Medium", "High", "Low"]
+    ids = [store.submit(f"F{i}", "Ram", "98", p, "", entry)["Grievance_ID"] for i, p in enumerate(priorities)]
+    assert store.resolve(ids[1]) and not store.resolve(ids[1])
+
+    # High before Medium before Low, oldest first within a priority; resolved ones drop out
+    pages = [store.page(n, page_size=2) for n in range(3)]
+    assert [list(p['Grievance_ID']) if len(p) else [] for p in pages] == [[ids[3], ids[2]], [ids[0], ids[4]], []]
+    reopened = app['GrievanceStore'](tmp_path)
+    assert (reopened.open_count, reopened.total_count) == (4, 5)
+    assert list(reopened.page(0, page_size=4)['Grievance_ID']) == [ids[3], ids[2], ids[0], ids[4]]
+
+# ------------------------------
+# WALL SEARCH
+# ------------------------------
+
+def test_wall_search_folds_spellings_and_matches_ids(app):
+    wall = pd.DataFrame({
+        'Owner_Name': ["Ghulam Rasool", "Vijay Kumar", "Sardar Gulaam Rasul", "Mohan Lal"],
+        'Khasra_No': ["101", "202", "303", "404"],
+        'AgriStack_FID': ["F-AA", "F-BB", "F-CC", "F-DD"],
+        'Village_Code': ["V1", "V1", "V2", "V3"],
+    })
+    index = app['WallSearchIndex'](wall)
+
+    assert sorted(index.search("Gulaam")[0]) == [0, 2]
+    assert list(index.search("wijay")[0]) == [1]
+    assert list(index.search("303")[0]) == [2]
+    assert list(index.search("f-dd")[0]) == [3]
+    rows, scores = index.search("Rasool", limit=1)
+    assert len(rows) == len(scores) == 1
+    assert len(index.search("zzzz")[0]) == len(index.search("  ")[0]) == 0
+    assert len(app['WallSearchIndex'](wall.iloc[:0]).search("Ghulam")[0]) == 0
+
+# ------------------------------
+# PHOTO STORE
+# ------------------------------
+
+def _jpeg(color, size=(640, 480)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "JPEG")
+    buffer.seek(0)
+    return buffer
+
+def test_photo_store_dedupes_and_thumbnails(app, tmp_path):
+    store = app['PhotoStore'](tmp_path)
+    sha, size, is_new = store.put(_jpeg("red"))
+    again = store.put(_jpeg("red"))
+    other = store.put(_jpeg("blue"))
+
+    assert is_new and again == (sha, size, False) and other[0] != sha
+    assert len(list((tmp_path / "blobs").glob("*/*"))) == 2
+    assert not list(tmp_path.glob("*.tmp"))
+    with Image.open(io.BytesIO(store.thumbnail(sha))) as thumb:
+        assert max(thumb.size) == app['PHOTO_THUMBNAIL_PX']
+    # Undecodable bytes are kept for audit, just without a preview
+    junk, _, _ = store.put(io.BytesIO(b"not an image"))
+    assert store.blob_path(junk).exists() and store.thumbnail(junk) is None
+
+# ------------------------------
+# PHASE 2 JOBS
+# ------------------------------
+
+def _job(app, tmp_path, job_id, data):
+    job = app['GovernanceJob'](job_id, [("village.csv", data)], app['IdentityIndex'](tmp_path / "identity"),
+                               app['RegistrySnapshotStore'](tmp_path / "snapshots"),
+                               app['AggregateCube'](keyed=True, path=tmp_path / "cube.sqlite3"),
+                               app['CropSeasonRegistry'](tmp_path / "crops"), app['FidCollisionIndex'](tmp_path / "fid"),
+                               app['RegistryChangeLog'](tmp_path / "cdc"))
+    job.checkpoint_dir = tmp_path / "jobs" / job_id
+    return job
+
+def _run_job(job):
+    job.start()
+    job._thread.join()
+    return job
+
+def test_failed_publish_leaves_nothing_live(app, tmp_path):
+    data = SAMPLE_CSV.read_bytes()
+    first = _run_job(_job(app, tmp_path, "P2-A", data))
+    assert first.status == "DONE"
+    state = lambda job: (sorted(p.name for p in (tmp_path / "snapshots").iterdir()),
+                         sorted(p.name for p in (tmp_path / "crops").glob("season=*/part-*")), job.district_cube.channel_summary(),
+                         job.identity_index.lookup(app['identity_index_records'](first.snapshot_store.get(first.run_id).frame('df_final'))),
+                         len(job.change_log.entries()))
+    before = state(first)
+
+    failing = _job(app, tmp_path, "P2-B", data.replace(b"Nahri", b"Barani").replace(b"Srinagar", b"Jammu"))
+    failing.change_log.record = lambda *args: (_ for _ in ()).throw(OSError("disk full"))
+    _run_job(failing)
+
+    assert (failing.status, failing.run_id, failing.error) == ("FAILED", None, "OSError: disk full")
+    after = state(failing)
+    assert after[:2] == before[:2] and after[3:] == before[3:]
+    assert after[2].equals(before[2])
+    reopened = app['AggregateCube'](keyed=True, path=tmp_path / "cube.sqlite3")
+    assert reopened.channel_summary().equals(before[2])
+    assert not failing.checkpoint_dir.exists()
+
+# ------------------------------
+# SUPER-CHECK SAMPLER
+# ------------------------------
+
+def test_super_check_sample_ignores_chunking(app):
+    rng = np.random.default_rng(3)
+    n = 20000
+    frame = pd.DataFrame({
+        'AgriStack_FID': [f"F{i}" for i in range(n)],
+        'Plot_ID': [f"P{i}" for i in range(n)],
+        'Governance_Channel': rng.choice(app['CHANNELS'], n),
+        'VDV_Device_ID': rng.choice([f"TAB-{i}" for i in range(5)], n),
+        'Village_Code': rng.choice([f"V{i}" for i in range(8)], n),
+        'Proxy_Verification': (rng.random(n) < 0.1).astype(object),
+    })
+    whole = app['SuperCheckSampler']()
+    whole.offer(frame)
+    forward = app['SuperCheckSampler']()
+    for start in range(0, n, 3000):
+        forward.offer(frame.iloc[start:start + 3000], start)
+    backward = app['SuperCheckSampler']()
+    for start in reversed(range(0, n, 7000)):
+        backward.offer(frame.iloc[start:start + 7000], start)
+
+    assert len(whole.selected()) > 0
+    assert np.array_equal(whole.selected(), forward.selected())
+    assert np.array_equal(whole.selected(), backward.selected())
+
+# ------------------------------
+# CHANGE FEED
+# ------------------------------
+
+def _registry(rows):
+    return pd.DataFrame(rows, columns=['AgriStack_FID', 'Plot_ID', 'Trust_Score', 'Land_Type',
+                                       'Governance_Channel', 'Super_Check_Selected', 'Audit_Log'])
+
+def test_compute_registry_delta_types(app):
+    previous = _registry([
+        ("F1", "P1", 0.9, "Nahri", "GREEN", False, "a"),
+        ("F2", "P2", 0.9, "Nahri", "GREEN", False, "a"),
+        ("F3", "P3", 0.9, "Nahri", "GREEN", False, "a"),
+        ("F9", "P9", 0.9, "Nahri", "GREEN", False, "a"),
+    ])
+    current = _registry([
+        ("F1", "P1", 0.9, "Nahri", "GREEN", True, "b"),
+        ("F2", "P2", 0.9, "Barani", "GREEN", False, "b"),
+        ("F3", "P3", 0.4, "Nahri", "RED", False, "b"),
+        ("F4", "P4", 0.9, "Nahri", "GREEN", False, "b"),
+    ])
+    delta = app['compute_registry_delta'](current, previous).set_index('AgriStack_FID')
+
+    # Sample draw and audit trail alone are not a change, and F9 (not in this run) is not retracted
+    assert sorted(delta.index) == ["F2", "F3", "F4"]
+    assert delta.loc["F2", 'Change_Type'] == "UPDATE"
+    assert delta.loc["F2", 'Changed_Columns'] == "Land_Type"
+    assert delta.loc["F3", 'Change_Type'] == "CHANNEL_TRANSITION"
+    assert delta.loc["F3", 'Prev_Governance_Channel'] == "GREEN"
+    assert delta.loc["F4", 'Change_Type'] == "INSERT"
+    assert 'Super_Check_Selected' not in delta.columns
+
+class _Snapshots:
+    """Stand-in snapshot store: run_id -> df_final."""
+
+    def __init__(self):
+        self.frames = {}
+
+    def get(self, run_id):
+        frame = self.frames.get(run_id)
+        return None if frame is None else type("Snap", (), {'frame': lambda self, name: frame})()
+
+def test_change_log_diffs_against_published_state(app, tmp_path):
+    village_x = _registry([("F1", "P1", 0.9, "Nahri", "GREEN", False, "a"), ("F2", "P2", 0.9, "Nahri", "GREEN", False, "a")])
+    village_y = _registry([("F7", "P7", 0.9, "Nahri", "GREEN", False, "a")])
+    snapshots = _Snapshots()
+    log = app['RegistryChangeLog'](tmp_path)
+    counts = []
+    for run_id, frame in (("A", village_x), ("B", village_y), ("C", village_x.assign(Super_Check_Selected=True))):
+        snapshots.frames[run_id] = frame
+        entry = log.record(run_id, snapshots)
+        counts.append((entry['inserted'], entry['updated'], entry['channel_transitions']))
+        del snapshots.frames[run_id]  # pruned snapshots must not force a restatement
+
+    assert counts == [(2, 0, 0), (1, 0, 0), (0, 0, 0)]
+    assert [e['sequence'] for e in log.entries()] == [1, 2, 3]
+
+# ------------------------------
+# BOUNDARY AREA
+# ------------------------------
+
+def test_polygon_areas_match_parse_boundary(app):
+    lat0, lon0 = 33.7782, 76.5762
+    dlat = 100 / 111320.0
+    dlon = 100 / (111320.0 * np.cos(np.radians(lat0)))
+    square = [(lat0, lon0), (lat0 + dlat, lon0), (lat0 + dlat, lon0 + dlon), (lat0, lon0 + dlon)]
+    boundaries = pd.Series([
+        app['format_boundary'](square),
+        "33.1,76.1;33.2,76.2",
+        "33.1,76.1,1600;33.2,76.2,1600;33.2,76.1,1600",
+        "",
+    ])
+    areas = app['polygon_areas_sqm'](boundaries)
+
+    assert areas[0] == pytest.approx(10000, rel=0.01)
+    # Fewer than 3 'lat,lon' vertices (including 'lat,lon,alt' points parse_boundary skips) has no area
+    assert [len(app['parse_boundary'](b)) for b in boundaries[1:]] == [2, 0, 0]
+    assert areas[1:].isna().all()
+
+# ------------------------------
+# IDENTITY SCORING
+# ------------------------------
+
+def test_identity_scores_below_the_floor_are_not_reported_as_measured(app, sample):
+    owners, verified = ["Ghulam Rasool Khan", "Vijay Kumar"], ["Zz", "Wijay Kumar"]
+    exact = app['identity_match_scores'](owners, verified)
+    bounded = app['identity_match_scores'](owners, verified, threshold=app['IDENTITY_EXACT_FLOOR'])
+    assert exact[0] == 0.0 and np.isnan(bounded[0])
+    assert bounded[1] == exact[1]
+
+    rows = sample.head(2).assign(Owner_Name=owners, VDV_Verified_Name=verified)
+    scored, _ = app['execute_verification_protocol'](rows)
+    assert np.isnan(scored['Identity_Score'].iloc[0])
+    assert "Identity Mismatch <40% (-0.50)" in scored['Audit_Trace'].iloc[0]
+
+# ------------------------------
+# POLICY SIMULATOR
+# ------------------------------
+
+@pytest.mark.parametrize("override", [
+    {},
+    {'geofence_m': 500},
+    {'fuzzy_threshold': 80},
+    {'green_cutoff': 0.95, 'amber_cutoff': 0.3},
+    {'amnesty_months': 0, 'area_tolerance_pct': 1},
+])
+def test_simulator_matches_engine(app, sample, override):
+    policy = {**app['DEFAULT_POLICY'], **override}
+    baseline, _ = app['execute_verification_protocol'](sample)
+    scored, _ = app['execute_verification_protocol'](sample, policy)
+    summary, _ = app['simulate_policies'](app['extract_policy_features'](baseline), [policy])
+
+    expected = scored['Governance_Channel'].value_counts()
+    assert {ch: int(summary.loc[0, ch]) for ch in app['CHANNELS']} == {ch: int(expected.get(ch, 0)) for ch in app['CHANNELS']}
+
+# ------------------------------
+# CROP REGISTRY
+# ------------------------------
+
+def test_crop_streaks_follow_the_calendar(app, tmp_path):
+    assert app['season_label']("rabi 2024-25") == app['season_label']("RABI_2025") == "Rabi 2025"
+    registry = app['CropSeasonRegistry'](tmp_path)
+    sown = [("P1", "Rabi 2024"), ("P1", "kharif 2024"), ("P1", "RABI_2025"),
+            ("P2", "Rabi 2024"), ("P2", "Rabi 2025"), ("P2", "Rabi 2026")]
+    for n, (plot, season) in enumerate(sown):
+        registry.append(f"R{n}", pd.DataFrame([{'AgriStack_FID': "F1", 'Plot_ID': plot, 'Season': season,
+                                                'Crop_Sown': "Wheat", 'Village_Code': "V", 'LGD_Code': "L"}]))
+
+    streaks = registry.crop_streaks("wheat", 2)
+    # P2 skipped both Kharif seasons, so its three Rabi seasons are not consecutive
+    assert streaks[['Plot_ID', 'Seasons', 'First_Season', 'Last_Season']].values.tolist() == [["P1", 3, "Rabi 2024", "Rabi 2025"]]